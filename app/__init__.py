@@ -28,13 +28,27 @@ def create_app():
 
     mail.init_app(app)
 
+    # Compile the email templates now rather than on the first send
+    from app.utils.email_templates import precompile_email_templates
+
+    precompile_email_templates()
+
     # Here to load blueprint
     from app.routes.application import application_bp
     from app.routes.email_preview import email_preview_bp
+    from app.routes.metrics import metrics_bp
 
     # Here to register blueprint
     app.register_blueprint(email_preview_bp, url_prefix="/admin/preview")
     app.register_blueprint(application_bp, url_prefix="/apply")
+    app.register_blueprint(metrics_bp)
+
+    # CLI commands, e.g. `flask --app run outbox list`
+    from app.commands import notify_cli, outbox_cli, trace_cli
+
+    app.cli.add_command(outbox_cli)
+    app.cli.add_command(notify_cli)
+    app.cli.add_command(trace_cli)
 
     # Don't mind about this
     @app.errorhandler(404)
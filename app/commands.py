@@ -0,0 +1,275 @@
+# app/commands.py
+import os
+import csv
+import time
+import json
+
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask.cli import AppGroup
+
+from app.utils.db import get_staff
+from app.utils.jobs import STATUSES, get_job_queue
+
+outbox_cli = AppGroup("outbox", help="Inspect and re-drive background jobs.")
+
+
+def _format_time(timestamp):
+    return time.strftime("%Y/%m/%d %H:%M:%S", time.localtime(timestamp))
+
+
+@outbox_cli.command("stats")
+def stats():
+    """Number of jobs per status."""
+    for status, count in get_job_queue().counts().items():
+        click.echo(f"{status:8} {count}")
+
+
+@outbox_cli.command("list")
+@click.option("--status", type=click.Choice(STATUSES), default=None)
+@click.option("--limit", default=50, show_default=True)
+def list_jobs(status, limit):
+    """Most recent jobs, newest first."""
+    for job in get_job_queue().list(status, limit):
+        click.echo(
+            f"{job['id']}  {job['kind']:20} {job['status']:8} "
+            f"stage={job['stage']} attempts={job['attempts']} "
+            f"created={_format_time(job['created_at'])}"
+            + (f"  error={job['last_error']}" if job["last_error"] else "")
+        )
+
+
+@outbox_cli.command("show")
+@click.argument("job_id")
+def show(job_id):
+    """Full data and state of one job."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise click.ClickException(f"No job {job_id}")
+    click.echo(json.dumps(job, indent=2, ensure_ascii=False))
+
+
+@outbox_cli.command("retry")
+@click.argument("job_id", required=False)
+@click.option(
+    "--status",
+    type=click.Choice(("failed", "pending")),
+    default="failed",
+    show_default=True,
+    help="Without JOB_ID, re-drive every job with this status.",
+)
+def retry(job_id, status):
+    """Re-drive a stuck job from the stage it stopped at."""
+    queue = get_job_queue()
+    count = queue.retry(job_id, status)
+    if job_id and not count:
+        job = queue.get(job_id)
+        if job is None:
+            raise click.ClickException(f"No job {job_id}")
+        raise click.ClickException(
+            f"Job {job_id} is {job['status']}, only failed or pending jobs can be retried"
+        )
+    click.echo(f"Re-queued {count} job(s), the bot picks them up on its next poll.")
+
+
+@outbox_cli.command("prune")
+@click.option("--days", default=30, show_default=True)
+def prune(days):
+    """Delete finished jobs older than --days."""
+    count = get_job_queue().prune(days * 86400)
+    click.echo(f"Deleted {count} finished job(s).")
+
+
+notify_cli = AppGroup("notify", help="Send result emails to many applicants at once.")
+
+OUTCOMES = ("pass", "fail")
+NOTIFY_FIELDS = ("uuid", "real_name", "email")
+
+
+def _read_results(file):
+    """Rows of uuid,outcome[,reason], blank lines and # comments skipped."""
+    results = []
+    for number, row in enumerate(csv.reader(file), start=1):
+        if not row or not row[0].strip() or row[0].startswith("#"):
+            continue
+        uuid, outcome = row[0].strip(), row[1].strip().lower() if len(row) > 1 else ""
+        if outcome not in OUTCOMES:
+            raise click.ClickException(f"Line {number}: outcome must be pass or fail")
+        reason = row[2].strip() if len(row) > 2 else None
+        results.append((uuid, outcome, reason))
+    return results
+
+
+def _fetch_applicant(uuid):
+    is_valid, applicant = get_staff({"uuid": uuid}, fields=NOTIFY_FIELDS)
+    return applicant[0] if is_valid and applicant else None
+
+
+def _wait(batch, total):
+    queue = get_job_queue()
+    while True:
+        counts = queue.batch_counts(f"{batch}:")
+        finished = counts["done"] + counts["failed"]
+        click.echo(
+            f"\r{finished}/{total} sent={counts['done']} failed={counts['failed']}",
+            nl=False,
+        )
+        if finished >= total:
+            click.echo()
+            return counts
+        time.sleep(2)
+
+
+@notify_cli.command("send")
+@click.argument("file", type=click.File("r", encoding="utf-8"))
+@click.option("--batch", default=None, help="Batch name, defaults to the file name.")
+@click.option("--wait", is_flag=True, help="Follow progress until every email is sent.")
+def send(file, batch, wait):
+    """
+    Queue pass/fail emails from a CSV of uuid,outcome[,reason].
+
+    The bot process sends them. Running the same file and batch again only
+    queues applicants that aren't queued yet, e.g. after fixing a lookup.
+    """
+    from app.discord.application_process.pipeline import submit_result_notifications
+
+    batch = batch or os.path.splitext(os.path.basename(file.name))[0]
+    results = _read_results(file)
+    click.echo(f"Fetching {len(results)} applicant(s)...")
+
+    found, missing = [], []
+    with ThreadPoolExecutor(max_workers=int(os.getenv("BACKEND_POOL_SIZE", 10))) as pool:
+        applicants = pool.map(_fetch_applicant, [uuid for uuid, _, _ in results])
+        for (uuid, outcome, reason), applicant in zip(results, applicants):
+            if applicant is None or not applicant.email:
+                missing.append(uuid)
+            else:
+                found.append((applicant, outcome, reason))
+
+    for uuid in missing:
+        click.echo(f"  not found, skipped: {uuid}")
+    added = submit_result_notifications(batch, found)
+    click.echo(
+        f"Batch {batch}: queued {added}, {len(found) - added} already queued, "
+        f"{len(missing)} skipped."
+    )
+    if wait:
+        _wait(batch, len(found))
+
+
+@notify_cli.command("status")
+@click.argument("batch")
+@click.option("--wait", is_flag=True, help="Follow progress until the batch is done.")
+def status(batch, wait):
+    """Progress of a batch."""
+    counts = get_job_queue().batch_counts(f"{batch}:")
+    total = sum(counts.values())
+    if not total:
+        raise click.ClickException(f"No batch {batch}")
+    if wait:
+        counts = _wait(batch, total)
+    for name, count in counts.items():
+        click.echo(f"{name:8} {count}")
+    if counts["failed"]:
+        click.echo("Re-drive failed emails with `outbox retry`.")
+
+
+trace_cli = AppGroup("trace", help="Where the time of an application went.")
+
+
+def _trace_path():
+    path = os.getenv("TRACE_PATH", "")
+    if not path:
+        raise click.ClickException(
+            "Tracing is off, set TRACE_PATH (e.g. traces.jsonl) in every process to record spans"
+        )
+    return path
+
+
+def _label(span):
+    if span is None:
+        return "(waiting)"
+    label = f"{span['name']} {span['op'] or ''}".rstrip()
+    return label if span["ok"] else f"{label}  FAILED"
+
+
+def _print_critical_path(spans):
+    from app.utils.tracing import critical_path
+
+    start = min(span["start"] for span in spans)
+    total = max(span["start"] + span["duration"] for span in spans) - start
+    click.echo(f"  critical path, {total:.3f}s:")
+    offset = 0.0
+    for span, seconds in critical_path(spans):
+        share = seconds / total * 100 if total else 100
+        click.echo(f"    +{offset:8.3f}s {seconds:8.3f}s {share:5.1f}%  {_label(span)}")
+        offset += seconds
+
+
+def _print_tree(spans):
+    start = min(span["start"] for span in spans)
+    ids = {span["span"] for span in spans}
+    children = {}
+    for span in spans:
+        parent = span["parent"] if span["parent"] in ids else None
+        children.setdefault(parent, []).append(span)
+
+    def walk(parent, depth):
+        for span in sorted(children.get(parent, []), key=lambda s: s["start"]):
+            click.echo(
+                f"    +{span['start'] - start:8.3f}s {span['duration']:8.3f}s  "
+                f"{'  ' * depth}{_label(span)}  [{span['site']}, {span['thread']}]"
+            )
+            walk(span["span"], depth + 1)
+
+    walk(None, 0)
+
+
+@trace_cli.command("show")
+@click.argument("uuid")
+@click.option(
+    "--gap",
+    default=600,
+    show_default=True,
+    help="Seconds of silence that separate two episodes, e.g. first and second form.",
+)
+def show_trace(uuid, gap):
+    """Every span of one applicant, with the critical path of each episode."""
+    from app.utils.tracing import episodes, read_spans
+
+    spans = read_spans(_trace_path(), uuid)
+    if not spans:
+        raise click.ClickException(f"No spans for {uuid}")
+    for episode in episodes(spans, gap):
+        click.echo(f"{_format_time(episode[0]['start'])}  {len(episode)} span(s)")
+        _print_tree(episode)
+        _print_critical_path(episode)
+
+
+@trace_cli.command("slow")
+@click.option("--limit", default=5, show_default=True)
+@click.option("--hours", default=24.0, show_default=True, help="Only episodes this recent.")
+@click.option("--gap", default=600, show_default=True)
+def slow(limit, hours, gap):
+    """Critical paths of the slowest application episodes."""
+    from app.utils.tracing import episodes, read_spans
+
+    since = time.time() - hours * 3600
+    by_trace = {}
+    for span in read_spans(_trace_path()):
+        if span["start"] >= since:
+            by_trace.setdefault(span["trace"], []).append(span)
+
+    slowest = []
+    for uuid, spans in by_trace.items():
+        for episode in episodes(spans, gap):
+            end = max(span["start"] + span["duration"] for span in episode)
+            slowest.append((end - episode[0]["start"], uuid, episode))
+    slowest.sort(key=lambda item: item[0], reverse=True)
+
+    if not slowest:
+        click.echo("No spans recorded in that window.")
+    for total, uuid, episode in slowest[:limit]:
+        click.echo(f"{uuid}  {total:.3f}s  started {_format_time(episode[0]['start'])}")
+        _print_critical_path(episode)
@@ -4,10 +4,8 @@ import time
 
 import discord
 
-from app.utils.db import get_staff, update_staff
-from app.utils.mail_sender import send_email
 from app.utils.jwt import generate_data_token
-from app.utils.shortlink import make_short_link
+from app.utils.shortlink import short_link
 
 if (
     os.getenv("APPLY_FORM_CHANNEL_ID") is None
@@ -71,14 +69,31 @@ def get_embed_title(action):
     return titles.get(action, "申請流程")
 
 
-async def send_initial_embed(form_response, interested_fields):
-    """Send the initial embed to the apply form channel."""
+def _applicant_data_url(uuid):
+    jwt = generate_data_token(uuid)
+    return f"{os.getenv("DOMAIN")}/apply/applicant_data/{jwt}"
+
+
+def applicant_data_link(uuid):
+    """Shortened link to the applicant data page, blocking."""
+    return short_link(_applicant_data_url(uuid), 0)
+
+
+def message_link(message):
+    return f"https://discord.com/channels/{message.guild.id}/{message.channel.id}/{message.id}"
+
+
+async def post_initial_embed(form_response, interested_fields, shorten_url):
+    """
+    Send the initial embed to the apply form channel.
+    Returns the message link, or None if the channel can't be found.
+    """
     bot = get_bot()
     await bot.wait_until_ready()
     channel = bot.get_channel(APPLY_FORM_CHANNEL_ID)
     if channel is None:
         print(f"Channel with ID {APPLY_FORM_CHANNEL_ID} not found.")
-        return
+        return None
 
     # Create the embed
     # if form_response.is_duplicate:
@@ -132,9 +147,6 @@ async def send_initial_embed(form_response, interested_fields):
     )
 
     # Add detailed data about applicant
-    jwt = generate_data_token(form_response.get("uuid"))
-    applicant_data = f"{os.getenv("DOMAIN")}/apply/applicant_data/{jwt}"
-    shorten_url = await make_short_link(applicant_data, 0)
     embed.add_field(
         name="申請者資料",
         value=f"{shorten_url}",
@@ -144,39 +156,25 @@ async def send_initial_embed(form_response, interested_fields):
     # Create view with buttons
     from .views import AcceptOrCancelView
 
-    view = AcceptOrCancelView()
+    view = AcceptOrCancelView(form_response.get("uuid"))
 
     message = await channel.send(embed=embed, view=view)
-
-    send_email(
-        subject="HackIt / 已收到您的工作人員報名表！",
-        recipient=form_response.get("email"),
-        template="emails/notification_email.html",
-        name=form_response.get("real_name"),
-        uuid=form_response.get("uuid"),
-    )
-
-    # Update applicant's assignee
-    payload = {
-        "apply_message": f"https://discord.com/channels/{message.guild.id}/{message.channel.id}/{message.id}",
-    }
-    update_staff(form_response.get("uuid"), payload)
+    return message_link(message)
 
 
-async def send_stage_embed(applicant, user):
-    """Sends an embed for next application stage."""
+async def post_stage_embed(applicant, user_id, shorten_url):
+    """
+    Sends the embed for the next application stage, the applicant being a
+    dict. Returns the message link, or None if the channel can't be found.
+    """
     bot = get_bot()
+    await bot.wait_until_ready()
     channel = bot.get_channel(APPLY_FORM_CHANNEL_ID)
     if channel is None:
         print(f"Channel with ID {APPLY_FORM_CHANNEL_ID} not found.")
-        return
+        return None
 
-    payload = {"discord_id": str(user.id)}
-    is_valid, staff = get_staff(payload)
-    if not is_valid:
-        print(f"Staff with ID {user.id} not found.")
-        await channel.send("錯誤，找不到負責人。")
-    discord_user = await bot.fetch_user(user.id)
+    discord_user = await bot.fetch_user(user_id)
 
     # Create the embed
     embed_title = "Stage 2: 申請進度更新"
@@ -217,9 +215,6 @@ async def send_stage_embed(applicant, user):
             )
 
     # Add detailed data about applicant
-    jwt = generate_data_token(applicant.get("uuid"))
-    applicant_data = f"{os.getenv("DOMAIN")}/apply/applicant_data/{jwt}"
-    shorten_url = await make_short_link(applicant_data, 0)
     embed.add_field(
         name="申請者資料",
         value=shorten_url,
@@ -229,22 +224,23 @@ async def send_stage_embed(applicant, user):
     # Create view with buttons
     from .views import InterviewResultView
 
-    view = InterviewResultView()
+    view = InterviewResultView(applicant.get("uuid"))
     message = await channel.send(embed=embed, view=view)
+    return message_link(message)
 
-    # Send log message
-    await send_log_message(
-        applicant,
-        discord_user,
-        action="ACCEPTED",
-    )
 
-    # Update applicant's assignee
-    payload = {
-        "team_leader": str(user.id),
-        "apply_message": f"https://discord.com/channels/{message.guild.id}/{message.channel.id}/{message.id}",
-    }
-    update_staff(applicant.get("uuid"), payload)
+async def delete_message(channel_id, message_id):
+    """Deletes a message, one that's already gone counts as deleted."""
+    bot = get_bot()
+    await bot.wait_until_ready()
+    channel = bot.get_channel(channel_id)
+    if channel is None:
+        print(f"Channel with ID {channel_id} not found.")
+        return
+    try:
+        await channel.get_partial_message(message_id).delete()
+    except discord.NotFound:
+        pass
 
 
 async def send_log_message(
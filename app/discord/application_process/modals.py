@@ -2,9 +2,12 @@
 import discord
 from discord.ui import Modal, TextInput
 
-from .helpers import APPLY_LOG_CHANNEL_ID, send_log_message
-from app.utils.mail_sender import send_email
-from app.utils.db import get_staff, update_staff
+from .helpers import APPLY_LOG_CHANNEL_ID
+from .pipeline import submit_application_failed, submit_assignee_changed
+from app.utils.db import get_staff_async
+from app.utils.metrics import call_site
+from app.utils.tracing import trace_id
+from app.utils.staff import PERMISSION_FIELDS
 
 
 class FailureReasonModal(Modal):
@@ -22,20 +25,17 @@ class FailureReasonModal(Modal):
         self.add_item(self.reason_input)
 
     async def on_submit(self, interaction: discord.Interaction):
+        call_site.set(f"modals.{type(self).__name__}")
+        trace_id.set(self.form_response.get("uuid"))
         try:
             """Handle modal submission."""
 
             # Update the form_response with the reason
             reason = self.reason_input.value
 
-            # Send email
-            send_email(
-                subject="HackIt / 招募結果通知",
-                recipient=self.form_response.get("email"),
-                template="emails/notification_fail.html",
-                name=self.form_response.get("real_name"),
-                uuid=self.form_response.get("uuid"),
-                reason=reason,
+            # Email and log message go through the outbox
+            submit_application_failed(
+                self.form_response, interaction.user.id, self.action, reason
             )
 
             await interaction.message.delete()
@@ -44,11 +44,6 @@ class FailureReasonModal(Modal):
                 ephemeral=True,
             )
 
-            # Send log message
-            await send_log_message(
-                self.form_response, interaction.user, action=self.action, reason=reason
-            )
-
             # btw, shouldn't we delete staff?
         except TypeError:
             await interaction.response.send_message(
@@ -70,6 +65,8 @@ class ChangeAssigneeModal(Modal):
         self.add_item(self.discord_id_input)
 
     async def on_submit(self, interaction: discord.Interaction):
+        call_site.set(f"modals.{type(self).__name__}")
+        trace_id.set(self.form_response.get("uuid"))
         try:
             """Handle modal submission."""
 
@@ -77,23 +74,16 @@ class ChangeAssigneeModal(Modal):
             discord_user_id = str(self.discord_id_input.value)
             payload = {"discord_id": discord_user_id}
 
-            is_valid, staff = get_staff(payload)
-            if not is_valid or staff.json().get("data")[0].get("permission_level") == 10:
+            is_valid, staff = await get_staff_async(payload, fields=PERMISSION_FIELDS)
+            if not is_valid or not staff or staff[0].permission_level == 10:
                 await interaction.response.send_message(
                     "輸入的Staff無法找到，或者權限不夠。", ephemeral=True
                 )
                 return
 
-            # Change assignee
-            payload = {"team_leader": discord_user_id}
-            update_staff(self.form_response.get("uuid"), payload)
-
-            # Send log message
-            await send_log_message(
-                self.form_response,
-                interaction.user,
-                action="CHANGED_ASSIGNEE",
-                new_assignee=discord_user_id,
+            # Assignee update and log message go through the outbox
+            submit_assignee_changed(
+                self.form_response, interaction.user.id, discord_user_id
             )
 
             await interaction.response.send_message("受理者已更換", ephemeral=True)
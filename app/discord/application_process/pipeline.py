@@ -0,0 +1,403 @@
+# app/discord/application_process/pipeline.py
+import os
+import asyncio
+
+import discord
+
+from .helpers import (
+    applicant_data_link,
+    delete_message,
+    get_bot,
+    post_initial_embed,
+    post_stage_embed,
+    send_log_message,
+)
+from app.utils.db import send_verify_email, update_staff, update_staff_with_images
+from app.utils.image import fetch_images
+from app.utils.image_cache import get_image_cache
+from app.utils.jobs import get_job_queue
+from app.utils.jwt import generate_next_url
+from app.utils.mail_sender import send_email
+from app.utils.staff import Staff
+
+NEW_APPLICATION = "new_application"
+SECOND_PART = "second_part"
+ACCEPTED = "accepted"
+ASSIGNEE_CHANGED = "assignee_changed"
+INTERVIEW_PASSED = "interview_passed"
+APPLICATION_FAILED = "application_failed"
+RESULT_NOTIFICATION = "result_notification"
+
+
+def send_and_wait(**kwargs):
+    """Sends through the mail worker and waits, so a failed send fails the stage."""
+    send_email(**kwargs).result(timeout=float(os.getenv("MAIL_SEND_TIMEOUT", 300)))
+
+
+def run_on_bot(coro):
+    """
+    Runs a coroutine on the bot's loop from a worker thread and waits for it.
+    The outbox runs on threads, so each Discord stage is one hop to the bot.
+    """
+    bot = get_bot()
+    future = asyncio.run_coroutine_threadsafe(coro, bot.loop)
+    return future.result(timeout=float(os.getenv("DISCORD_STAGE_TIMEOUT", 60)))
+
+
+# Stages for a new application, see JobQueue for how they're run.
+# data is {"form_response": ..., "interested_fields": [...]}
+
+
+def shortlink_stage(data, state):
+    uuid = data["form_response"].get("uuid")
+    # A plain blocking call, this runs on an outbox worker thread
+    shorten_url = applicant_data_link(uuid)
+    if not shorten_url:
+        raise RuntimeError("Shortlink service failed")
+    return {"shorten_url": shorten_url}
+
+
+def discord_stage(data, state):
+    apply_message = run_on_bot(
+        post_initial_embed(
+            data["form_response"], data["interested_fields"], state["shorten_url"]
+        )
+    )
+    if not apply_message:
+        raise RuntimeError("Initial embed was not posted")
+    return {"apply_message": apply_message}
+
+
+def email_stage(data, state):
+    form_response = data["form_response"]
+    send_and_wait(
+        subject="HackIt / 已收到您的工作人員報名表！",
+        recipient=form_response.get("email"),
+        template="emails/notification_email.html",
+        name=form_response.get("real_name"),
+        uuid=form_response.get("uuid"),
+    )
+
+
+def apply_message_stage(data, state):
+    # Update applicant's assignee
+    payload = {"apply_message": state["apply_message"]}
+    if not update_staff(data["form_response"].get("uuid"), payload):
+        raise RuntimeError("Failed to save apply_message")
+
+
+NEW_APPLICATION_STAGES = [
+    ("shortlink", shortlink_stage),
+    ("discord", discord_stage),
+    ("email", email_stage),
+    ("apply_message", apply_message_stage),
+]
+
+
+# Stages for the second form, after the token was checked.
+# data is {"uuid": ..., "form_response": {...}, "image_urls": {field: url}}
+
+ID_IMAGE_FIELDS = ("studentidfront", "studentidback", "idcard_front", "idcard_back")
+
+
+def id_images_stage(data, state):
+    """Saves the second form, with the ID images, in one backend update."""
+    uuid = data["uuid"]
+    # Downloaded at once instead of one after another. An image the
+    # applicant didn't upload is sent as null, one that fails to download
+    # fails the stage so it's retried.
+    images, report = fetch_images(data["image_urls"])
+    failed = [name for name, image in images.items() if not image]
+    if failed:
+        raise RuntimeError(f"Could not download {', '.join(failed)}")
+    print(
+        f"Images for {uuid}: {report['original_bytes'] // 1024} KB -> "
+        f"{report['bytes'] // 1024} KB (saved {report['saved_bytes'] // 1024} KB, "
+        f"{report['cached']} cached)"
+    )
+    id_images = {
+        "student_card": {
+            "front": images.get("studentidfront"),
+            "back": images.get("studentidback"),
+        },
+        "id_card": {
+            "front": images.get("idcard_front"),
+            "back": images.get("idcard_back"),
+        },
+    }
+
+    # On a retry or resubmission, don't upload the cards again if the
+    # backend already has exactly these images.
+    image_cache = get_image_cache()
+    if image_cache:
+        for field in image_cache.unchanged(uuid, id_images):
+            del id_images[field]
+
+    if not update_staff_with_images(uuid, data["form_response"], id_images):
+        raise RuntimeError("Failed to save the second form")
+    if image_cache:
+        image_cache.mark_uploaded(uuid, id_images)
+
+
+def verify_email_stage(data, state):
+    # Cloudflare verification email, for connecting hackit to the main email
+    if not send_verify_email(data["uuid"]):
+        raise RuntimeError("Backend didn't send the verification email")
+
+
+SECOND_PART_STAGES = [
+    ("id_images", id_images_stage),
+    ("verify_email", verify_email_stage),
+]
+
+
+# Stages for a review decision.
+# data is {"applicant": {...}, "user_id": ..., "action": ..., ...}
+
+
+def pass_email_stage(data, state):
+    applicant = data["applicant"]
+    send_and_wait(
+        subject="HackIt / 招募結果通知",
+        recipient=applicant.get("email"),
+        template="emails/notification_pass.html",
+        name=applicant.get("real_name"),
+        uuid=applicant.get("uuid"),
+        next_url=generate_next_url(applicant.get("uuid")),
+        discord_url=os.getenv("DISCORD_SERVER_LINK") or None,
+    )
+
+
+def fail_email_stage(data, state):
+    applicant = data["applicant"]
+    send_and_wait(
+        subject="HackIt / 招募結果通知",
+        recipient=applicant.get("email"),
+        template="emails/notification_fail.html",
+        name=applicant.get("real_name"),
+        uuid=applicant.get("uuid"),
+        reason=data.get("reason"),
+    )
+
+
+def log_stage(data, state):
+    run_on_bot(
+        send_log_message(
+            Staff(data["applicant"]),
+            discord.Object(id=int(data["user_id"])),
+            action=data["action"],
+            applicant_data=data.get("applicant_data"),
+            reason=data.get("reason"),
+            new_assignee=data.get("new_assignee"),
+        )
+    )
+
+
+def accepted_shortlink_stage(data, state):
+    shorten_url = applicant_data_link(data["applicant"].get("uuid"))
+    if not shorten_url:
+        raise RuntimeError("Shortlink service failed")
+    return {"shorten_url": shorten_url}
+
+
+def stage_embed_stage(data, state):
+    stage_message = run_on_bot(
+        post_stage_embed(data["applicant"], int(data["user_id"]), state["shorten_url"])
+    )
+    if not stage_message:
+        raise RuntimeError("Stage embed was not posted")
+    return {"stage_message": stage_message}
+
+
+def assignee_stage(data, state):
+    # Update applicant's assignee
+    payload = {
+        "team_leader": data["user_id"],
+        "apply_message": state["stage_message"],
+    }
+    if not update_staff(data["applicant"].get("uuid"), payload):
+        raise RuntimeError("Failed to save assignee")
+
+
+def delete_review_message_stage(data, state):
+    # Last, so the buttons stay until everything above went through
+    run_on_bot(delete_message(data["channel_id"], data["message_id"]))
+
+
+def change_assignee_stage(data, state):
+    payload = {"team_leader": data["new_assignee"]}
+    if not update_staff(data["applicant"].get("uuid"), payload):
+        raise RuntimeError("Failed to change assignee")
+
+
+def clear_assignee_stage(data, state):
+    # Delete applicant's assignee
+    payload = {
+        "team_leader": None,
+        "apply_message": None,
+    }
+    if not update_staff(data["applicant"].get("uuid"), payload):
+        raise RuntimeError("Failed to clear assignee")
+
+
+ACCEPTED_STAGES = [
+    ("shortlink", accepted_shortlink_stage),
+    ("stage_embed", stage_embed_stage),
+    ("log", log_stage),
+    ("assignee", assignee_stage),
+    ("delete_message", delete_review_message_stage),
+]
+
+ASSIGNEE_CHANGED_STAGES = [
+    ("assignee", change_assignee_stage),
+    ("log", log_stage),
+]
+
+INTERVIEW_PASSED_STAGES = [
+    ("email", pass_email_stage),
+    ("log", log_stage),
+    ("clear_assignee", clear_assignee_stage),
+]
+
+APPLICATION_FAILED_STAGES = [
+    ("email", fail_email_stage),
+    ("log", log_stage),
+]
+
+
+# Bulk notification at the end of a round, one job per applicant.
+# data is {"applicant": {...}, "outcome": "pass" or "fail", "reason": ...}
+
+
+def result_email_stage(data, state):
+    if data["outcome"] == "pass":
+        pass_email_stage(data, state)
+    else:
+        fail_email_stage(data, state)
+
+
+RESULT_NOTIFICATION_STAGES = [
+    ("email", result_email_stage),
+]
+
+
+def new_application_trace(data):
+    return data["form_response"].get("uuid")
+
+
+def second_part_trace(data):
+    return data["uuid"]
+
+
+def applicant_trace(data):
+    return data["applicant"].get("uuid")
+
+
+def setup_jobs():
+    """Registers every job kind, call .start() on the result to drain the outbox."""
+    queue = get_job_queue()
+    queue.register(NEW_APPLICATION, NEW_APPLICATION_STAGES, new_application_trace)
+    queue.register(SECOND_PART, SECOND_PART_STAGES, second_part_trace)
+    queue.register(ACCEPTED, ACCEPTED_STAGES, applicant_trace)
+    queue.register(ASSIGNEE_CHANGED, ASSIGNEE_CHANGED_STAGES, applicant_trace)
+    queue.register(INTERVIEW_PASSED, INTERVIEW_PASSED_STAGES, applicant_trace)
+    queue.register(APPLICATION_FAILED, APPLICATION_FAILED_STAGES, applicant_trace)
+    queue.register(RESULT_NOTIFICATION, RESULT_NOTIFICATION_STAGES, applicant_trace)
+    return queue
+
+
+def submit_new_application(form_response, interested_fields):
+    """Queues the Discord, shortlink and email side effects of a new application."""
+    return get_job_queue().submit(
+        NEW_APPLICATION,
+        {"form_response": form_response, "interested_fields": interested_fields},
+    )
+
+
+def submit_second_part(uuid, form_response, image_urls):
+    """Queues saving the second form with its ID images, and the verification email."""
+    return get_job_queue().submit(
+        SECOND_PART,
+        {"uuid": uuid, "form_response": form_response, "image_urls": image_urls},
+    )
+
+
+def submit_accepted(applicant, user_id, message):
+    """
+    Queues the next stage embed, log message and assignee update, then
+    deleting the review message. The job id is the message's, so a second
+    click on the same message queues nothing, returns whether it was queued.
+    """
+    return get_job_queue().submit_many(
+        ACCEPTED,
+        [
+            (
+                f"{ACCEPTED}:{message.id}",
+                {
+                    "applicant": applicant.to_dict(),
+                    "user_id": str(user_id),
+                    "action": "ACCEPTED",
+                    "channel_id": message.channel.id,
+                    "message_id": message.id,
+                },
+            )
+        ],
+    ) > 0
+
+
+def submit_assignee_changed(applicant, user_id, new_assignee):
+    """Queues the assignee update and its log message."""
+    return get_job_queue().submit(
+        ASSIGNEE_CHANGED,
+        {
+            "applicant": applicant.to_dict(),
+            "user_id": str(user_id),
+            "action": "CHANGED_ASSIGNEE",
+            "new_assignee": new_assignee,
+        },
+    )
+
+
+def submit_interview_passed(applicant, user_id, applicant_data):
+    """Queues the pass email, log message and assignee reset."""
+    return get_job_queue().submit(
+        INTERVIEW_PASSED,
+        {
+            "applicant": applicant.to_dict(),
+            "user_id": str(user_id),
+            "action": "INTERVIEW_PASSED",
+            "applicant_data": applicant_data,
+        },
+    )
+
+
+def submit_application_failed(applicant, user_id, action, reason):
+    """Queues the failure email and log message, action is the log action."""
+    return get_job_queue().submit(
+        APPLICATION_FAILED,
+        {
+            "applicant": applicant.to_dict(),
+            "user_id": str(user_id),
+            "action": action,
+            "reason": reason,
+        },
+    )
+
+
+def submit_result_notifications(batch, results):
+    """
+    Queues a result email per applicant, results being
+    [(applicant, outcome, reason), ...]. Job ids are "<batch>:<uuid>", so
+    running the same batch again only queues applicants not queued yet.
+    Returns the number of jobs added.
+    """
+    return get_job_queue().submit_many(
+        RESULT_NOTIFICATION,
+        [
+            (
+                f"{batch}:{applicant.uuid}",
+                {"applicant": applicant.to_dict(), "outcome": outcome, "reason": reason},
+            )
+            for applicant, outcome, reason in results
+        ],
+    )
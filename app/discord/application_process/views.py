@@ -1,15 +1,20 @@
 # app/discord/application_process/views.py
-import os
 import time
+import asyncio
 import discord
 
 from discord.ui import Button, View
 
 from .modals import FailureReasonModal, ChangeAssigneeModal
-from .helpers import send_stage_embed
-from app.utils.mail_sender import send_email
-from app.utils.jwt import generate_next_url
-from app.utils.db import get_staff, update_staff
+from .pipeline import submit_accepted, submit_interview_passed
+from app.utils.db import get_staff_async, iter_staff_async
+from app.utils import tracing
+from app.utils.metrics import call_site
+from app.utils.staff import PERMISSION_FIELDS, PROFILE_FIELDS
+
+# Discord embed limits, listings stop fetching once these are reached.
+EMBED_DESCRIPTION_LIMIT = 4096
+EMBED_FIELD_LIMIT = 25
 
 
 class FindMyView(View):
@@ -30,26 +35,32 @@ class FindMyView(View):
             await interaction.response.defer()
             discord_user_id = str(interaction.user.id)
             payload = {"discord_id": discord_user_id}
-            is_valid, staff = get_staff(payload)
+            is_valid, staff = await get_staff_async(payload, fields=PERMISSION_FIELDS)
             if (
                 not is_valid
-                or (staff.json().get("data") is None)
-                or staff.json().get("data")[0].get("permission_level") == 10
+                or not staff
+                or staff[0].permission_level == 10
             ):
                 await interaction.followup.send("你無權執行此操作。", ephemeral=True)
                 return
 
+            # Only fetch what we render, and only until the embed is full
             payload = {"team_leader": discord_user_id, "premission_level": 10}
-            is_valid, applicants = get_staff(payload)
-            if not is_valid:
-                await interaction.response.send_message(
-                    "資料庫未知錯誤", ephemeral=True
-                )
+            applicants = iter_staff_async(
+                payload, fields=("real_name", "apply_message")
+            )
 
-            if applicants is None:
-                await interaction.followup.send("你目前沒有受理的申請者よ")
+            description = ""
+            async for applicant in applicants:
+                line = f"**{applicant.real_name}**:\n{applicant.apply_message}\n\n"
+                if len(description) + len(line) > EMBED_DESCRIPTION_LIMIT - 20:
+                    description += "...（過多無法顯示）"
+                    break
+                description += line
 
-            applicants = applicants.json().get("data")
+            if not description:
+                await interaction.followup.send("你目前沒有受理的申請者よ")
+                return
 
             embed_title = "你受理的申請者:"
             embed = discord.Embed(
@@ -57,16 +68,6 @@ class FindMyView(View):
                 color=0xFF4500,
             )
             embed.set_footer(text=time.strftime("%Y/%m/%d %H:%M") + " ● HackIt")
-
-            if applicants is None:
-                await interaction.followup.send("目前沒有未受理申請者", ephemeral=True)
-
-            description = ""
-            for applicant in applicants:
-                link = applicant.get("apply_message")
-                real_name = applicant.get("real_name")
-                description += "**" + real_name + "**:\n" + link + "\n\n"
-
             embed.description = description
             await interaction.followup.send(embed=embed, ephemeral=True)
         except TypeError:
@@ -90,26 +91,15 @@ class FindMyView(View):
             await interaction.response.defer()
             discord_user_id = str(interaction.user.id)
             payload = {"discord_id": discord_user_id}
-            is_valid, staff = get_staff(payload)
+            is_valid, staff = await get_staff_async(payload, fields=PERMISSION_FIELDS)
             if (
                 not is_valid
-                or (staff.json().get("data") is None)
-                or staff.json().get("data")[0].get("permission_level") == 0
+                or not staff
+                or staff[0].permission_level == 0
             ):
                 await interaction.followup.send("你無權執行此操作。", ephemeral=True)
                 return
 
-            payload = {"team_leader": "0"}
-            is_valid, applicants = get_staff(payload)
-            if not is_valid:
-                await interaction.response.send_message(
-                    "資料庫未知錯誤", ephemeral=True
-                )
-
-            if applicants is None:
-                await interaction.followup.send("目前沒有未受理申請者", ephemeral=True)
-
-            applicants = applicants.json().get("data")
             embed_title = "未受理的申請者:"
             embed = discord.Embed(
                 title=embed_title,
@@ -117,433 +107,300 @@ class FindMyView(View):
             )
             embed.set_footer(text=time.strftime("%Y/%m/%d %H:%M") + " ● HackIt")
 
-            if applicants is None:
-                await interaction.followup.send("目前沒有未受理申請者", ephemeral=True)
-
-            for applicant in applicants:
-                link = applicant.get("apply_message")
-                embed.add_field(name="連結:", value=link, inline=False)
-
-            await interaction.followup.send(embed=embed, ephemeral=True)
-        except TypeError:
-            await interaction.response.send_message(
-                "錯誤，交互者或申請者不再資料庫內", ephemeral=True
-            )
-
-
-class FormResponseView(View):
-    """Base View that handles form_response retrieval."""
-
-    def __init__(self):
-        super().__init__(timeout=None)
-
-
-class AcceptOrCancelView(FormResponseView):
-    """View with Accept and Cancel buttons for Stage 1."""
-
-    def __init__(self):
-        super().__init__()
-
-    @discord.ui.button(
-        label="受理",
-        style=discord.ButtonStyle.success,
-        custom_id="accept_or_cancel_view_accept",
-    )
-    async def accept_button(self, interaction: discord.Interaction, button: Button):
-        try:
-            """Handle Accept button click."""
-            if button.custom_id != "accept_or_cancel_view_accept":
-                return
-
-            # Get applicant info
-            message = interaction.message
-            if not message.embeds:
-                await interaction.response.send_message("未知錯誤", ephemeral=True)
-                return
-            embed = message.embeds[0]
-
-            uuid = None
-            for field in embed.fields:
-                if field.name == "申請識別碼":
-                    uuid = field.value
+            # Only fetch the links, and only until the embed is full
+            payload = {"team_leader": "0"}
+            applicants = iter_staff_async(payload, fields=("apply_message",))
+            async for applicant in applicants:
+                if len(embed.fields) == EMBED_FIELD_LIMIT:
+                    embed.description = "...（過多無法全部顯示）"
                     break
-
-            payload = {"uuid": uuid}
-            print(payload)
-            is_valid, applicant = get_staff(payload)
-            if not is_valid:
-                await interaction.response.send_message("未知錯誤", ephemeral=True)
-                return
-
-            print(applicant.json())
-            applicant = applicant.json().get("data")[0]
-
-            # Check permission level of the user who pressed it
-            discord_user_id = str(interaction.user.id)
-            payload = {"discord_id": discord_user_id}
-
-            is_valid, staff = get_staff(payload)
-            if (
-                not is_valid
-                or staff.json().get("data")[0].get("permission_level") == 10
-            ):
-                await interaction.response.send_message(
-                    "你無權執行此操作。", ephemeral=True
+                embed.add_field(
+                    name="連結:", value=applicant.apply_message, inline=False
                 )
-                return
-
-            # Proceed to next stage
-            await interaction.response.send_message(
-                "已受理，進入下一階段。", ephemeral=True
-            )
-            await interaction.message.delete()
-
-            # Send embed
-            await send_stage_embed(applicant, interaction.user)
-        except TypeError:
-            await interaction.response.send_message(
-                "錯誤，交互者或申請者不再資料庫內", ephemeral=True
-            )
-
-    @discord.ui.button(
-        label="取消",
-        style=discord.ButtonStyle.danger,
-        custom_id="accept_or_cancel_view_cancel",
-    )
-    async def cancel_button(self, interaction: discord.Interaction, button: Button):
-        try:
-            """Handle Cancel button click."""
-            if button.custom_id != "accept_or_cancel_view_cancel":
-                return
-
-            # Get applicant info
-            message = interaction.message
-            if not message.embeds:
-                await interaction.response.send_message("未知錯誤", ephemeral=True)
-                return
-            embed = message.embeds[0]
-
-            uuid = None
-            for field in embed.fields:
-                if field.name == "申請識別碼":
-                    uuid = field.value
-                    break
-
-            payload = {"uuid": uuid}
-            is_valid, applicant = get_staff(payload)
-            if not is_valid:
-                await interaction.response.send_message("未知錯誤", ephemeral=True)
-                return
-
-            applicant = applicant.json().get("data")[0]
 
-            # Identity verification
-            discord_user_id = str(interaction.user.id)
-            payload = {"discord_id": discord_user_id}
-
-            is_valid, staff = get_staff(payload)
-            if (
-                not is_valid
-                or staff.json().get("data")[0].get("permission_level") == 10
-            ):
-                await interaction.response.send_message(
-                    "你無權執行此操作。", ephemeral=True
-                )
+            if not embed.fields:
+                await interaction.followup.send("目前沒有未受理申請者", ephemeral=True)
                 return
 
-            # Open modal to input cancellation reason
-            modal = FailureReasonModal(applicant, action="NOT_ACCEPTED")
-            await interaction.response.send_modal(modal)
+            await interaction.followup.send(embed=embed, ephemeral=True)
         except TypeError:
             await interaction.response.send_message(
                 "錯誤，交互者或申請者不再資料庫內", ephemeral=True
             )
 
 
-class InterviewResultView(FormResponseView):
-    """View for Stage 2: Interview Result."""
+def get_embed_field(message, name):
+    """Returns the value of the embed field called `name`, or None."""
+    if not message.embeds:
+        return None
+    for field in message.embeds[0].fields:
+        if field.name == name:
+            return field.value
+    return None
 
-    @discord.ui.button(
-        label="面試通過",
-        style=discord.ButtonStyle.success,
-        custom_id="interview_result_view_pass",
-    )
-    async def pass_button(self, interaction: discord.Interaction, button: Button):
-        try:
-            """Handle Interview Passed button click."""
-            if button.custom_id != "interview_result_view_pass":
-                return
-
-            # Get applicant info
-            message = interaction.message
-            if not message.embeds:
-                await interaction.response.send_message("未知錯誤", ephemeral=True)
-                return
-            embed = message.embeds[0]
 
-            uuid = None
-            for field in embed.fields:
-                if field.name == "申請識別碼":
-                    uuid = field.value
-                    break
-
-            payload = {"uuid": uuid}
-            is_valid, applicant = get_staff(payload)
-            if not is_valid:
-                await interaction.response.send_message("未知錯誤", ephemeral=True)
-                return
+async def reply(interaction, content):
+    """Ephemeral reply that works whether or not we already deferred."""
+    if interaction.response.is_done():
+        await interaction.followup.send(content, ephemeral=True)
+    else:
+        await interaction.response.send_message(content, ephemeral=True)
 
-            applicant = applicant.json().get("data")[0]
 
-            # Identity verification
-            discord_user_id = str(interaction.user.id)
-            payload = {"discord_id": discord_user_id}
+class ReviewAction:
+    """A review button and the handler it routes to."""
 
-            is_valid, staff = get_staff(payload)
-            if (
-                not is_valid
-                or staff.json().get("data")[0].get("permission_level") == 10
-            ):
-                await interaction.response.send_message(
-                    "你無權執行此操作。", ephemeral=True
-                )
-                return
-
-            staff = staff.json().get("data")[0]
-            if staff.get("discord_id") != applicant.get("team_leader"):
-                await interaction.response.send_message(
-                    "你不是此申請者的受理人", ephemeral=True
-                )
-                return
+    def __init__(
+        self, name, label, style, legacy_custom_id, handler, require_assignee, defer
+    ):
+        self.name = name
+        self.label = label
+        self.style = style
+        self.legacy_custom_id = legacy_custom_id
+        self.handler = handler
+        self.require_assignee = require_assignee
+        self.defer = defer
+
+
+# action name -> ReviewAction, filled by @review_action below
+REVIEW_ACTIONS = {}
+
+
+def review_action(
+    name, label, style, legacy_custom_id, require_assignee=True, defer=True
+):
+    """
+    Registers handler(interaction, applicant, staff) as a review button.
+    Handlers that open a modal must pass defer=False, Discord only accepts a
+    modal as the first response.
+    """
+
+    def decorator(handler):
+        REVIEW_ACTIONS[name] = ReviewAction(
+            name, label, style, legacy_custom_id, handler, require_assignee, defer
+        )
+        return handler
+
+    return decorator
+
+
+async def run_review(interaction, action, uuid=None):
+    """
+    Shared pipeline for every review button: defer, fetch the applicant
+    and the clicking leader concurrently, check permissions, then call
+    the action's handler.
+
+    `uuid` comes from the button's custom_id, messages posted before the
+    custom_id carried it fall back to reading the embed.
+    """
+    # Each interaction runs in its own task, no need to reset these
+    call_site.set(f"views.{action.name}")
+    current = tracing.begin("interaction", action.name)
+    try:
+        if action.defer:
+            await interaction.response.defer()
 
-            next_url = generate_next_url(applicant.get("uuid"))
-            discord_url = (
-                os.getenv("DISCORD_SERVER_LINK")
-                if os.getenv("DISCORD_SERVER_LINK")
-                else None
+        if uuid is None:
+            uuid = get_embed_field(interaction.message, "申請識別碼")
+        if uuid is None:
+            await reply(interaction, "未知錯誤")
+            return
+        tracing.trace_id.set(uuid)
+
+        (applicant_valid, applicant), (staff_valid, staff) = await asyncio.gather(
+            get_staff_async({"uuid": uuid}, fields=PROFILE_FIELDS),
+            get_staff_async(
+                {"discord_id": str(interaction.user.id)},
+                fields=PERMISSION_FIELDS,
+            ),
+        )
+
+        if not applicant_valid or not applicant:
+            await reply(interaction, "未知錯誤")
+            return
+        applicant = applicant[0]
+
+        # Identity verification
+        if not staff_valid or not staff or staff[0].permission_level == 10:
+            await reply(interaction, "你無權執行此操作。")
+            return
+        staff = staff[0]
+
+        if action.require_assignee and staff.discord_id != applicant.team_leader:
+            await reply(interaction, "你不是此申請者的受理人")
+            return
+
+        await action.handler(interaction, applicant, staff)
+    except TypeError:
+        await reply(interaction, "錯誤，交互者或申請者不再資料庫內")
+    finally:
+        tracing.finish(current)
+
+
+class ReviewButton(
+    discord.ui.DynamicItem[Button],
+    template=r"review:(?P<action>[a-z_]+):(?P<uuid>[0-9a-f-]+)",
+):
+    """
+    Review button whose custom_id carries the action and the applicant uuid,
+    so any click is routed without parsing the message.
+    Registered once with bot.add_dynamic_items(ReviewButton).
+    """
+
+    def __init__(self, action, uuid):
+        self.action = REVIEW_ACTIONS[action]
+        self.uuid = uuid
+        super().__init__(
+            Button(
+                label=self.action.label,
+                style=self.action.style,
+                custom_id=f"review:{action}:{uuid}",
             )
+        )
 
-            send_email(
-                subject="HackIt / 招募結果通知",
-                recipient=applicant.get("email"),
-                template="emails/notification_pass.html",
-                name=applicant.get("real_name"),
-                uuid=applicant.get("uuid"),
-                next_url=next_url,
-                discord_url=discord_url,
-            )
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match["action"], match["uuid"])
 
-            await interaction.response.send_message(
-                "面試通過，已傳送第二部分表單給申請者。", ephemeral=True
-            )
-            await interaction.message.delete()
+    async def callback(self, interaction):
+        await run_review(interaction, self.action, self.uuid)
 
-            # Send log message
-            from .helpers import send_log_message
 
-            applicant_data = None
-            for field in embed.fields:
-                if field.name == "申請者資料":
-                    applicant_data = field.value
-                    break
+class LegacyReviewButton(Button):
+    """Button with the old static custom_id, for messages posted before ReviewButton."""
 
-            await send_log_message(
-                applicant,
-                interaction.user,
-                action="INTERVIEW_PASSED",
-                applicant_data=applicant_data,
-            )
+    def __init__(self, action):
+        self.action = REVIEW_ACTIONS[action]
+        super().__init__(
+            label=self.action.label,
+            style=self.action.style,
+            custom_id=self.action.legacy_custom_id,
+        )
 
-            # Delete applicant's assignee
-            payload = {
-                "team_leader": None,
-                "apply_message": None,
-            }
-            update_staff(applicant.get("uuid"), payload)
-        except TypeError:
-            await interaction.response.send_message(
-                "錯誤，交互者或申請者不再資料庫內", ephemeral=True
-            )
+    async def callback(self, interaction):
+        await run_review(interaction, self.action)
 
-    @discord.ui.button(
-        label="更換受理人",
-        style=discord.ButtonStyle.primary,
-        custom_id="change_assignee",
-    )
-    async def change_assignee_button(
-        self, interaction: discord.Interaction, button: Button
-    ):
-        try:
-            """Handle assignee chagning button (so you can blame others)"""
-            if button.custom_id != "change_assignee":
-                return
 
-            # Get applicant info
-            message = interaction.message
-            if not message.embeds:
-                await interaction.response.send_message("未知錯誤", ephemeral=True)
-                return
-            embed = message.embeds[0]
+class FormResponseView(View):
+    """
+    Base View that handles form_response retrieval.
+    With a uuid the buttons carry it in their custom_id, without one this
+    is the persistent view serving old messages.
+    """
 
-            uuid = None
-            for field in embed.fields:
-                if field.name == "申請識別碼":
-                    uuid = field.value
-                    break
+    actions = ()
 
-            payload = {"uuid": uuid}
-            is_valid, applicant = get_staff(payload)
-            if not is_valid:
-                await interaction.response.send_message("未知錯誤", ephemeral=True)
-                return
+    def __init__(self, uuid=None):
+        super().__init__(timeout=None)
+        for action in self.actions:
+            if uuid:
+                self.add_item(ReviewButton(action, uuid))
+            else:
+                self.add_item(LegacyReviewButton(action))
 
-            applicant = applicant.json().get("data")[0]
 
-            # Identity verification
-            discord_user_id = str(interaction.user.id)
-            payload = {"discord_id": discord_user_id}
+class AcceptOrCancelView(FormResponseView):
+    """View with Accept and Cancel buttons for Stage 1."""
 
-            is_valid, staff = get_staff(payload)
-            if (
-                not is_valid
-                or staff.json().get("data")[0].get("permission_level") == 10
-            ):
-                await interaction.response.send_message(
-                    "你無權執行此操作。", ephemeral=True
-                )
-                return
+    actions = ("accept", "cancel")
 
-            staff = staff.json().get("data")[0]
-            if staff.get("discord_id") != applicant.get("team_leader"):
-                await interaction.response.send_message(
-                    "你不是此申請者的受理人", ephemeral=True
-                )
-                return
 
-            modal = ChangeAssigneeModal(applicant)
-            await interaction.response.send_modal(modal)
-        except TypeError:
-            await interaction.response.send_message(
-                "錯誤，交互者或申請者不再資料庫內", ephemeral=True
-            )
+class InterviewResultView(FormResponseView):
+    """View for Stage 2: Interview Result."""
 
-    @discord.ui.button(
-        label="面試失敗",
-        style=discord.ButtonStyle.danger,
-        custom_id="interview_result_view_fail",
+    actions = (
+        "interview_passed",
+        "change_assignee",
+        "interview_failed",
+        "interview_cancelled",
     )
-    async def fail_button(self, interaction: discord.Interaction, button: Button):
-        try:
-            """Handle Interview Failed button click."""
-            if button.custom_id != "interview_result_view_fail":
-                return
 
-            # Get applicant info
-            message = interaction.message
-            if not message.embeds:
-                await interaction.response.send_message("未知錯誤", ephemeral=True)
-                return
-            embed = message.embeds[0]
-
-            uuid = None
-            for field in embed.fields:
-                if field.name == "申請識別碼":
-                    uuid = field.value
-                    break
 
-            payload = {"uuid": uuid}
-            is_valid, applicant = get_staff(payload)
-            if not is_valid:
-                await interaction.response.send_message("未知錯誤", ephemeral=True)
-                return
-
-            applicant = applicant.json().get("data")[0]
-
-            # Identity verification
-            discord_user_id = str(interaction.user.id)
-            payload = {"discord_id": discord_user_id}
-
-            is_valid, staff = get_staff(payload)
-            if (
-                not is_valid
-                or staff.json().get("data")[0].get("permission_level") == 10
-            ):
-                await interaction.response.send_message(
-                    "你無權執行此操作。", ephemeral=True
-                )
-                return
-
-            staff = staff.json().get("data")[0]
-            if staff.get("discord_id") != applicant.get("team_leader"):
-                await interaction.response.send_message(
-                    "你不是此申請者的受理人", ephemeral=True
-                )
-                return
-
-            modal = FailureReasonModal(applicant, action="INTERVIEW_FAILED")
-            await interaction.response.send_modal(modal)
-        except TypeError:
-            await interaction.response.send_message(
-                "錯誤，交互者或申請者不再資料庫內", ephemeral=True
-            )
-
-    @discord.ui.button(
-        label="取消",
-        style=discord.ButtonStyle.danger,
-        custom_id="interview_result_view_cancel",
+@review_action(
+    "accept",
+    label="受理",
+    style=discord.ButtonStyle.success,
+    legacy_custom_id="accept_or_cancel_view_accept",
+    require_assignee=False,
+)
+async def accept(interaction, applicant, staff):
+    """Handle Accept button click."""
+    # Next stage embed, log message and assignee go through the outbox,
+    # which deletes this message once they're done
+    if not submit_accepted(applicant, interaction.user.id, interaction.message):
+        await interaction.followup.send("此申請已被受理。", ephemeral=True)
+        return
+    await interaction.followup.send("已受理，進入下一階段。", ephemeral=True)
+
+
+@review_action(
+    "cancel",
+    label="取消",
+    style=discord.ButtonStyle.danger,
+    legacy_custom_id="accept_or_cancel_view_cancel",
+    require_assignee=False,
+    defer=False,
+)
+async def cancel(interaction, applicant, staff):
+    """Handle Cancel button click."""
+    # Open modal to input cancellation reason
+    modal = FailureReasonModal(applicant, action="NOT_ACCEPTED")
+    await interaction.response.send_modal(modal)
+
+
+@review_action(
+    "interview_passed",
+    label="面試通過",
+    style=discord.ButtonStyle.success,
+    legacy_custom_id="interview_result_view_pass",
+)
+async def interview_passed(interaction, applicant, staff):
+    """Handle Interview Passed button click."""
+    # Email, log message and assignee reset go through the outbox
+    applicant_data = get_embed_field(interaction.message, "申請者資料")
+    submit_interview_passed(applicant, interaction.user.id, applicant_data)
+
+    await interaction.followup.send(
+        "面試通過，已傳送第二部分表單給申請者。", ephemeral=True
     )
-    async def cancel_button(self, interaction: discord.Interaction, button: Button):
-        try:
-            """Handle Cancel button click."""
-            if button.custom_id != "interview_result_view_cancel":
-                return
-
-            # Get applicant info, yes I wrote this 5 times because of circular import problem.
-            message = interaction.message
-            if not message.embeds:
-                await interaction.response.send_message("未知錯誤", ephemeral=True)
-                return
-            embed = message.embeds[0]
-
-            uuid = None
-            for field in embed.fields:
-                if field.name == "申請識別碼":
-                    uuid = field.value
-                    break
-
-            payload = {"uuid": uuid}
-            is_valid, applicant = get_staff(payload)
-            if not is_valid:
-                await interaction.response.send_message("未知錯誤", ephemeral=True)
-                return
-
-            applicant = applicant.json().get("data")[0]
-
-            # Identity verification
-            discord_user_id = str(interaction.user.id)
-            payload = {"discord_id": discord_user_id}
-
-            is_valid, staff = get_staff(payload)
-            if (
-                not is_valid
-                or staff.json().get("data")[0].get("permission_level") == 10
-            ):
-                await interaction.response.send_message(
-                    "你無權執行此操作。", ephemeral=True
-                )
-                return
-
-            staff = staff.json().get("data")[0]
-            if staff.get("discord_id") != applicant.get("team_leader"):
-                await interaction.response.send_message(
-                    "你不是此申請者的受理人", ephemeral=True
-                )
-                return
-
-            # Open modal to input cancellation reason
-            modal = FailureReasonModal(applicant, action="INTERVIEW_CANCELLED")
-            await interaction.response.send_modal(modal)
-        except TypeError:
-            await interaction.response.send_message(
-                "錯誤，交互者或申請者不再資料庫內", ephemeral=True
-            )
+    await interaction.message.delete()
+
+
+@review_action(
+    "change_assignee",
+    label="更換受理人",
+    style=discord.ButtonStyle.primary,
+    legacy_custom_id="change_assignee",
+    defer=False,
+)
+async def change_assignee(interaction, applicant, staff):
+    """Handle assignee chagning button (so you can blame others)"""
+    modal = ChangeAssigneeModal(applicant)
+    await interaction.response.send_modal(modal)
+
+
+@review_action(
+    "interview_failed",
+    label="面試失敗",
+    style=discord.ButtonStyle.danger,
+    legacy_custom_id="interview_result_view_fail",
+    defer=False,
+)
+async def interview_failed(interaction, applicant, staff):
+    """Handle Interview Failed button click."""
+    modal = FailureReasonModal(applicant, action="INTERVIEW_FAILED")
+    await interaction.response.send_modal(modal)
+
+
+@review_action(
+    "interview_cancelled",
+    label="取消",
+    style=discord.ButtonStyle.danger,
+    legacy_custom_id="interview_result_view_cancel",
+    defer=False,
+)
+async def interview_cancelled(interaction, applicant, staff):
+    """Handle Cancel button click."""
+    # Open modal to input cancellation reason
+    modal = FailureReasonModal(applicant, action="INTERVIEW_CANCELLED")
+    await interaction.response.send_modal(modal)
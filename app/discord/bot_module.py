@@ -7,12 +7,14 @@ from dotenv import load_dotenv
 from app.discord.application_process import setup as application_process_setup
 from app.discord.customs import setup as customs_setup
 from app.discord.customs.views import CustomsView
+from app.utils.metrics import instrument_discord
 
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 
 bot = commands.Bot(command_prefix="/", intents=intents)
+instrument_discord(bot)
 load_dotenv()
 
 application_process_setup(bot)
@@ -24,11 +26,20 @@ async def on_ready():
     from app.discord.application_process.views import (
         AcceptOrCancelView,
         InterviewResultView,
+        ReviewButton,
     )
 
+    # Buttons carrying the applicant uuid in their custom_id
+    bot.add_dynamic_items(ReviewButton)
+    # Old messages with static custom_ids
     bot.add_view(AcceptOrCancelView())
     bot.add_view(InterviewResultView())
     bot.add_view(CustomsView())
+
+    # Drain the outbox, replaying whatever a restart interrupted
+    from app.discord.application_process.pipeline import setup_jobs
+
+    setup_jobs().start()
     print(f"Logged in as {bot.user}")
 
 
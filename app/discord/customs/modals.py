@@ -1,10 +1,11 @@
 # app/discord/customs/modals.py
 import os
 import discord
-from flask import jsonify
-import requests
 
-from app.utils.db import get_staff
+from app.utils.db import get_staff_async, update_staff_async
+from app.utils.metrics import call_site
+from app.utils.tracing import trace_id
+from app.utils.staff import PROFILE_FIELDS
 
 group = {
     "行政部": [os.getenv("AD_ROLE")],
@@ -39,15 +40,17 @@ class PassportCheck(discord.ui.Modal):
         ))
 
     async def on_submit(self, interaction: discord.Interaction):
+        call_site.set(f"modals.{type(self).__name__}")
+        trace_id.set(self.children[1].value)
         user = interaction.user
 
         payload = {"uuid": self.children[1].value}
-        is_valid, applicant = get_staff(payload)
-        if not is_valid or not applicant or not applicant.json().get("data"):
+        is_valid, applicant = await get_staff_async(payload, fields=PROFILE_FIELDS)
+        if not is_valid or not applicant:
             await interaction.response.send_message("查驗失敗，並非有效的驗證資訊，請與 official@hackit.tw 聯繫。", ephemeral=True)
             return
         
-        data = applicant.json().get("data")
+        data = applicant
         if not data or data[0].get("real_name") != self.children[0].value:
             await interaction.response.send_message("查驗失敗，並非有效的驗證資訊，請與 official@hackit.tw 聯繫。", ephemeral=True)
             return
@@ -62,16 +65,8 @@ class PassportCheck(discord.ui.Modal):
             "permission_level": 3,
         }
 
-        headers = {"Authorization": f"Bearer {os.getenv('AUTH_TOKEN', '')}"}
-
-        response = requests.post(
-            url=f"{os.getenv("BACKEND_ENDPOINT")}/staff/update/{self.children[1].value}",
-            headers=headers,
-            json=form_response,
-        )
-
-        if response.status_code != 200:
-            print(response.text)
+        is_valid = await update_staff_async(self.children[1].value, form_response)
+        if not is_valid:
             await interaction.response.send_message("查驗失敗，並非有效的驗證資訊，請與 official@hackit.tw 聯繫。", ephemeral=True)
             return
 
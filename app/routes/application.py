@@ -1,18 +1,26 @@
 # app/routes/application.py
 import os
+import json
 import uuid
-import asyncio
-import requests
+import hashlib
+import functools
 
-from flask import Blueprint, jsonify, request, render_template
-from app.discord.application_process.helpers import send_initial_embed, get_bot
+from flask import Blueprint, jsonify, request, render_template, make_response
+from app.discord.application_process.pipeline import (
+    ID_IMAGE_FIELDS,
+    submit_new_application,
+    submit_second_part,
+)
 
 from app.utils.jwt import parse_token
-from app.utils.image import image_url_to_base64
-from app.utils.db import get_staff
+from app.utils.tracing import trace_id
+from app.utils.capture import captured
+from app.utils.form_schema import Field, FormSchema, choice, choices, file_url, phone
+from app.utils.idempotency import get_idempotency_store
+from app.utils.db import get_staff, create_staff
+from app.utils.staff import PROFILE_FIELDS
 
 application_bp = Blueprint("application", __name__)
-bot = get_bot()
 
 # Stage one
 field_mapping = {
@@ -95,61 +103,163 @@ two_interested_fields_mapping = {
 
 hidden_value_secret = os.getenv("HIDDEN_VALUE_SECRET")
 
+first_part_schema = FormSchema(
+    "first_part_application",
+    [
+        Field("name", field_mapping["Name"]),
+        Field("email", field_mapping["Email"]),
+        Field("phone_number", field_mapping["Phone"], phone),
+        Field(
+            "high_school_stage",
+            field_mapping["HighSchoolStage"],
+            choice(high_school_stage_mapping),
+        ),
+        Field("city", field_mapping["City"]),
+        Field(
+            "top_interested_field",
+            field_mapping["TopInterestedField"],
+            choices(top_interested_field_mapping),
+            default=[],
+        ),
+        Field(
+            "other_interested_fields",
+            field_mapping["OtherInterestedFields"],
+            choices(other_interested_fields_mapping),
+            default=[],
+        ),
+        Field("introduction", field_mapping["Introduction"]),
+        Field("choicereason", field_mapping["ChoiceReason"]),
+        Field("relevant_experience", field_mapping["RelatedExperience"]),
+        Field("signature_url", field_mapping["SignatureURL"]),
+    ],
+)
+
+second_part_schema = FormSchema(
+    "second_part_application",
+    [
+        Field("nickname", field_mapping_two["Nickname"]),
+        Field("official_email", field_mapping_two["OfficialEmail"]),
+        Field("school", field_mapping_two["SchoolName"]),
+        Field("national_id", field_mapping_two["NationalID"]),
+        Field(
+            "interested_fields2",
+            field_mapping_two["InterestedFields2"],
+            choices(two_interested_fields_mapping),
+            default=[],
+        ),
+        Field("emergency_contact_name", field_mapping_two["EmergencyContactName"]),
+        Field(
+            "emergency_contact_phone",
+            field_mapping_two["EmergencyContactPhone"],
+            phone,
+        ),
+        Field(
+            "emergency_contact_relationship",
+            field_mapping_two["EmergencyContactRelationship"],
+        ),
+        Field("emergency_contact_name2", field_mapping_two["EmergencyContactName2"]),
+        Field(
+            "emergency_contact_phone2",
+            field_mapping_two["EmergencyContactPhone2"],
+            phone,
+        ),
+        Field(
+            "emergency_contact_relationship2",
+            field_mapping_two["EmergencyContactRelationship2"],
+        ),
+        Field("studentidfront", field_mapping_two["StudentIDFront"], file_url),
+        Field("studentidback", field_mapping_two["StudentIDBack"], file_url),
+        Field("idcard_front", field_mapping_two["IDCardFront"], file_url),
+        Field("idcard_back", field_mapping_two["IDCardBack"], file_url),
+    ],
+)
+
+hidden_fields_schema = FormSchema(
+    "hidden fields", [Field("token", hidden_value_secret)]
+)
+
+# Keys the form provider may put its submission id under
+SUBMISSION_ID_KEYS = ("submissionId", "responseId", "id")
+
+
+def submission_id(body):
+    """
+    The form provider's id for this submission. Without one, a hash of the
+    answers: a retried webhook carries exactly the same body.
+    """
+    for key in SUBMISSION_ID_KEYS:
+        if body.get(key):
+            return str(body[key])
+    answers = [body.get("answers", []), body.get("hiddenFields", [])]
+    return hashlib.sha256(
+        json.dumps(answers, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def idempotent(view):
+    """
+    Replays the original response when the same submission is delivered
+    again, instead of creating the staff record, Discord embed and emails
+    twice. Only successful responses are remembered, a failed request can
+    be retried for real.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return view(*args, **kwargs)
+
+        store = get_idempotency_store()
+        key = f"{view.__name__}:{submission_id(body)}"
+        previous = store.begin(key)
+        if previous and previous["status"] == "done":
+            print(f"Replaying response for duplicate submission {key}")
+            response = make_response(previous["body"], previous["status_code"])
+            response.mimetype = previous["mimetype"]
+            response.headers["Idempotent-Replay"] = "true"
+            return response
+        if previous:
+            # The first delivery is still running, 409 makes the provider retry later
+            return jsonify({"status": "error", "message": "Already processing"}), 409
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            store.release(key)
+            raise
+        if 200 <= response.status_code < 300:
+            store.finish(key, response.status_code, response.get_data(), response.mimetype)
+        else:
+            store.release(key)
+        return response
+
+    return wrapper
+
 
 @application_bp.route("/first_part_application", methods=["POST"])
-async def first_part():
+@captured(first_part_schema)
+@idempotent
+def first_part():
     try:
         form_data = request.json.get("answers", [])
-        name = email = phone_number = high_school_stage = city = introduction = choicereason = relevant_experience = signature_url = None
-        top_interested_field = other_interested_fields = []
 
         # Parse form data
-        for answer in form_data:
-            field_id = answer.get("id")
-            field_value = answer.get("value")
-
-            if field_id == field_mapping.get("Name"):
-                name = field_value
-            elif field_id == field_mapping.get("Email"):
-                email = field_value
-            elif field_id == field_mapping.get("Phone"):
-                phone_number = field_value
-            elif field_id == field_mapping.get("HighSchoolStage"):
-                if isinstance(field_value, dict):
-                    stage_id = field_value.get("value", [None])[0]
-                    high_school_stage = high_school_stage_mapping.get(
-                        stage_id, stage_id
-                    )
-            elif field_id == field_mapping.get("City"):
-                city = field_value
-            elif field_id == field_mapping.get("TopInterestedField"):
-                top_interested_field_ids = (
-                    field_value.get("value", [])
-                    if isinstance(field_value, dict)
-                    else []
-                )
-                top_interested_field = [
-                    top_interested_field_mapping.get(field_id, field_id)
-                    for field_id in top_interested_field_ids
-                ]
-            elif field_id == field_mapping.get("OtherInterestedFields"):
-                other_interested_field_ids = (
-                    field_value.get("value", [])
-                    if isinstance(field_value, dict)
-                    else []
-                )
-                other_interested_fields = [
-                    other_interested_fields_mapping.get(field_id, field_id)
-                    for field_id in other_interested_field_ids
-                ]
-            elif field_id == field_mapping.get("Introduction"):
-                introduction = field_value
-            elif field_id == field_mapping.get("ChoiceReason"):
-                choicereason = field_value
-            elif field_id == field_mapping.get("RelatedExperience"):
-                relevant_experience = field_value
-            elif field_id == field_mapping.get("SignatureURL"):
-                signature_url = field_value
+        values, _ = first_part_schema.parse(form_data)
+        name = values["name"]
+        email = values["email"]
+        phone_number = values["phone_number"]
+        high_school_stage = values["high_school_stage"]
+        city = values["city"]
+        top_interested_field = values["top_interested_field"]
+        other_interested_fields = values["other_interested_fields"]
+        introduction = values["introduction"]
+        choicereason = values["choicereason"]
+        relevant_experience = values["relevant_experience"]
+        signature_url = values["signature_url"]
+
+        if not name or not email or not phone_number or not top_interested_field:
+            return jsonify({"status": "error", "message": "Bad request"}), 400
 
         print("---------------------------------")
         print(
@@ -158,15 +268,15 @@ async def first_part():
         )
 
         user_uuid = str(uuid.uuid4())
+        trace_id.set(user_uuid)
 
         form_response = {
             "uuid": user_uuid,
             "real_name": name,
             "email": email,
             "official_email": "placeholder@hackit.tw",  # we'll overwrite this later
-            "phone_number": "0"
             # database required phone number without prefix
-            + phone_number[4:],
+            "phone_number": phone_number,
             "high_school_stage": high_school_stage,
             "city": city,
             "introduction": introduction,
@@ -190,103 +300,44 @@ async def first_part():
         other_interested_fields.insert(0, top_interested_field[0])
 
         # Saves to database
-        headers = {"Authorization": f"Bearer {os.getenv('AUTH_TOKEN', '')}"}
-
-        response = requests.post(
-            url=f"{os.getenv("BACKEND_ENDPOINT")}/staff/create/new",
-            headers=headers,
-            json=form_response,
-        )
+        is_valid, _ = create_staff(form_response)
 
-        if response.status_code != 201:
-            print(response.text)
+        if not is_valid:
             return jsonify({"status": "error", "message": "Bad request"}), 400
 
-        # Sends to discord, this sometimes don't want to work.
+        # Discord embed, shortlink and email run in the background, the form
+        # provider doesn't need to wait for them.
+        job_id = submit_new_application(form_response, other_interested_fields)
 
-        future = asyncio.run_coroutine_threadsafe(
-            send_initial_embed(
-                form_response, other_interested_fields), bot.loop
-        )
-        future.result()
-
-        return jsonify({"status": "ok"}), 200
+        return jsonify({"status": "accepted", "job_id": job_id}), 202
     except Exception as e:
         print(e)
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
 @application_bp.route("/second_part_application", methods=["POST"])
+@captured(second_part_schema)
+@idempotent
 def second_part():
     try:
         form_data = request.json.get("answers", [])
         hidden_values = request.json.get("hiddenFields", [])
-        nickname = official_email = school = national_id = emergency_contact_name = (
-            emergency_contact_phone
-        ) = emergency_contact_relationship = emergency_contact_name2 = (
-            emergency_contact_phone2
-        ) = emergency_contact_relationship2 = studentidfront = studentidback = (
-            idcard_front
-        ) = idcard_back = token = None
-        interested_fields2 = []
-
-        for answer in form_data:
-            field_id = answer.get("id")
-            field_value = answer.get("value")
-
-            if field_id == field_mapping_two.get("Nickname"):
-                nickname = field_value
-            elif field_id == field_mapping_two.get("OfficialEmail"):
-                official_email = field_value
-            elif field_id == field_mapping_two.get("SchoolName"):
-                school = field_value
-            elif field_id == field_mapping_two.get("NationalID"):
-                national_id = field_value
-            elif field_id == field_mapping_two.get("InterestedFields2"):
-                interested_field2_ids = (
-                    field_value.get("value", [])
-                    if isinstance(field_value, dict)
-                    else []
-                )
-                interested_fields2 = [
-                    two_interested_fields_mapping.get(field_id, field_id)
-                    for field_id in interested_field2_ids
-                ]
-            elif field_id == field_mapping_two.get("EmergencyContactName"):
-                emergency_contact_name = field_value
-            elif field_id == field_mapping_two.get("EmergencyContactPhone"):
-                emergency_contact_phone = "0" + field_value[4:]
-            elif field_id == field_mapping_two.get("EmergencyContactRelationship"):
-                emergency_contact_relationship = field_value
-            elif field_id == field_mapping_two.get("EmergencyContactName2"):
-                emergency_contact_name2 = field_value
-            elif field_id == field_mapping_two.get("EmergencyContactPhone2"):
-                emergency_contact_phone2 = "0" + field_value[4:]
-            elif field_id == field_mapping_two.get("EmergencyContactRelationship2"):
-                emergency_contact_relationship2 = field_value
-            elif field_id == field_mapping_two.get("StudentIDFront"):
-                studentidfront = image_url_to_base64(field_value.get("url"))
-                if not studentidfront:
-                    return jsonify({"status": "error", "message": "Bad request"}), 400
-            elif field_id == field_mapping_two.get("StudentIDBack"):
-                studentidback = image_url_to_base64(field_value.get("url"))
-                if not studentidfront:
-                    return jsonify({"status": "error", "message": "Bad request"}), 400
-            elif field_id == field_mapping_two.get("IDCardFront"):
-                idcard_front = image_url_to_base64(field_value.get("url"))
-                if not studentidfront:
-                    return jsonify({"status": "error", "message": "Bad request"}), 400
-            elif field_id == field_mapping_two.get("IDCardBack"):
-                idcard_back = image_url_to_base64(field_value.get("url"))
-                if not studentidfront:
-                    return jsonify({"status": "error", "message": "Bad request"}), 400
-
-        for data in hidden_values:
-            field_id = data.get("id")
-            field_value = data.get("value")
-
-            if field_id == hidden_value_secret:
-                token = field_value
+
+        values, _ = second_part_schema.parse(form_data)
+        nickname = values["nickname"]
+        official_email = values["official_email"]
+        school = values["school"]
+        national_id = values["national_id"]
+        interested_fields2 = values["interested_fields2"]
+        emergency_contact_name = values["emergency_contact_name"]
+        emergency_contact_phone = values["emergency_contact_phone"]
+        emergency_contact_relationship = values["emergency_contact_relationship"]
+        emergency_contact_name2 = values["emergency_contact_name2"]
+        emergency_contact_phone2 = values["emergency_contact_phone2"]
+        emergency_contact_relationship2 = values["emergency_contact_relationship2"]
+        image_urls = {name: values[name] for name in ID_IMAGE_FIELDS if values[name]}
+
+        token = hidden_fields_schema.parse(hidden_values)[0]["token"]
 
         print("---------------------------------")
         print(
@@ -294,8 +345,6 @@ def second_part():
                 emergency_contact_name}, {emergency_contact_name2}, {interested_fields2[0]}"
         )
 
-        headers = {"Authorization": f"Bearer {os.getenv('AUTH_TOKEN', '')}"}
-
         if not token:
             return jsonify({"status": "error", "message": "Bad request"}), 400
 
@@ -303,8 +352,7 @@ def second_part():
 
         if not is_valid or uuid == "":
             return jsonify({"status": "error", "message": "Bad request"}), 400
-
-        # Saves to database
+        trace_id.set(uuid)
 
         form_response = {
             "nickname": nickname,
@@ -312,14 +360,6 @@ def second_part():
             "school": school,
             "national_id": national_id,
             "interested_fields2": interested_fields2[0],
-            "student_card": {
-                "front": studentidfront,
-                "back": studentidback,
-            },
-            "id_card": {
-                "front": idcard_front,
-                "back": idcard_back,
-            },
             "emergency_contact": [
                 {
                     "name": emergency_contact_name,
@@ -344,28 +384,11 @@ def second_part():
                 }
             )
 
-        response = requests.post(
-            url=f"{os.getenv("BACKEND_ENDPOINT")}/staff/update/{uuid}",
-            headers=headers,
-            json=form_response,
-        )
-
-        if response.status_code != 200:
-            print(response.text)
-            return jsonify({"status": "error", "message": "Bad request"}), 400
-
-        # Sends cloudflare verification email for connecting hackit to main email
-
-        response = requests.post(
-            url=f"{os.getenv("BACKEND_ENDPOINT")}/staff/send/verify/{uuid}",
-            headers=headers,
-        )
-
-        if response.status_code != 200:
-            print(response.text)
-            return jsonify({"status": "error", "message": "Bad request"}), 400
+        # Downloading, re-encoding and uploading the ID images takes
+        # seconds, the form provider doesn't need to wait for them.
+        job_id = submit_second_part(uuid, form_response, image_urls)
 
-        return jsonify({"status": "ok"})
+        return jsonify({"status": "accepted", "job_id": job_id}), 202
     except Exception as e:
         print(e)
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -380,12 +403,12 @@ def applicant_data(jwt):
             return jsonify({"status": "error", "message": "Forbidden"}), 403
 
         payload = {"uuid": uuid}
-        is_valid, applicant = get_staff(payload)
+        is_valid, applicant = get_staff(payload, fields=PROFILE_FIELDS)
 
-        if not is_valid:
+        if not is_valid or not applicant:
             return jsonify({"status": "error", "message": "Internal server error"}), 500
 
-        applicant = applicant.json().get("data")[0]
+        applicant = applicant[0]
         print(applicant)
         return render_template("applicant_data.html", staff=applicant)
     except Exception as e:
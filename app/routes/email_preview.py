@@ -1,6 +1,8 @@
 # app/routes/email_preview.py
 from flask import Blueprint, render_template, request
 
+from app.utils.email_templates import render_email_cached
+
 email_preview_bp = Blueprint('email_preview', __name__)
 
 
@@ -12,4 +14,7 @@ def preview():
     uuid = request.args.get('uuid')
     email = request.args.get('email')
     reason = request.args.get('reason', '').replace('|', '<br>')
+    if email_template and email_template.startswith('emails/'):
+        # Same precompiled, CSS-inlined templates the mail worker sends
+        return render_email_cached(email_template, name=name, uuid=uuid, reason=reason, email=email)
     return render_template(email_template, name=name, uuid=uuid, reason=reason, email=email)
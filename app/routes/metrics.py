@@ -0,0 +1,75 @@
+# app/routes/metrics.py
+import os
+import time
+
+from flask import Blueprint, Response, g, request
+
+from app.utils import mail_sender, tracing
+from app.utils.db import get_staff_cache, get_staff_flight
+from app.utils.jobs import get_job_queue
+from app.utils.metrics import CONTENT_TYPE, call_site, get_registry
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.before_app_request
+def start_timer():
+    # Backend calls made by this request are labelled with its endpoint,
+    # e.g. application.first_part
+    call_site.set(request.endpoint or "unknown")
+    # Views that know the applicant set tracing.trace_id, the request span
+    # is the parent of everything they call
+    tracing.reset()
+    g.request_span = tracing.begin("http")
+
+
+@metrics_bp.after_app_request
+def record_request(response):
+    current = g.pop("request_span", None)
+    if current is None:
+        return response
+    current.op = f"{request.method} {request.url_rule or 'unmatched'}"
+    current.ok = response.status_code < 500
+    if request.endpoint != "metrics.metrics":
+        get_registry().observe(
+            "http", current.op, time.perf_counter() - current.started, current.ok
+        )
+    tracing.finish(current)
+    return response
+
+
+def _gauges():
+    gauges = {
+        ("hackit_outbox_jobs", "Outbox jobs by status."): {
+            (("status", status),): count
+            for status, count in get_job_queue().counts().items()
+        },
+        (
+            "hackit_staff_cache",
+            "Staff cache counters, coalesced being lookups saved by single-flight.",
+        ): {
+            (("stat", name),): value
+            for name, value in {
+                **get_staff_cache().stats(),
+                "coalesced": get_staff_flight().saved,
+            }.items()
+        },
+    }
+    # Only the process that sends emails has a mail worker
+    if mail_sender._mail_worker is not None:
+        gauges[("hackit_mail", "Mail worker queue depth, counters and latencies.")] = {
+            (("stat", name),): value
+            for name, value in mail_sender._mail_worker.stats().items()
+        }
+    return gauges
+
+
+get_registry().add_gauges(_gauges)
+
+
+@metrics_bp.route("/metrics")
+def metrics():
+    token = os.getenv("METRICS_TOKEN")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return Response("Unauthorized", status=401)
+    return Response(get_registry().render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,135 @@
+# app/utils/capture.py
+import os
+import time
+import functools
+import threading
+
+from flask import make_response, request
+
+from app.utils.jsonl import JsonlSink, read_jsonl
+
+_sink = None
+_lock = threading.Lock()
+
+
+def _mask_char(char):
+    if char.isdigit():
+        return "0"
+    if char.isascii() and char.isalpha():
+        return "X" if char.isupper() else "x"
+    if char.isalpha():
+        # Chinese names and introductions keep their length in UTF-8 too
+        return "字"
+    return char
+
+
+def mask(value):
+    """
+    Same shape without the content: "Amy 0912-345" -> "Xxx 0000-000".
+    Punctuation, spaces, lengths, nesting, dict keys and numbers are kept.
+    """
+    if isinstance(value, str):
+        return "".join(map(_mask_char, value))
+    if isinstance(value, list):
+        return [mask(item) for item in value]
+    if isinstance(value, dict):
+        return {key: mask(item) for key, item in value.items()}
+    return value
+
+
+def _redact_answer(answer, schema):
+    if not isinstance(answer, dict):
+        return mask(answer)
+    redacted = {
+        key: value if key == "id" else mask(value) for key, value in answer.items()
+    }
+    # Option ids say nothing about the applicant, kept so the replay parses the same
+    options = schema.options(answer.get("id"))
+    value = answer.get("value")
+    if options and isinstance(value, dict):
+        selected = value.get("value") or []
+        if isinstance(selected, list) and all(option in options for option in selected):
+            redacted["value"] = value
+    return redacted
+
+
+def redact(body, schema):
+    """
+    The form submission with every answer and hidden field masked but its
+    field id, and the selected options of choice fields kept as they are.
+    """
+    redacted = {}
+    for key, value in body.items():
+        if key in ("answers", "hiddenFields") and isinstance(value, list):
+            redacted[key] = [_redact_answer(answer, schema) for answer in value]
+        else:
+            redacted[key] = mask(value)
+    return redacted
+
+
+def captured(schema):
+    """
+    Writes a redacted copy of every request to the view, with its status
+    and timing, to the capture corpus if CAPTURE_PATH is set.
+    """
+
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            sink = get_capture_sink()
+            if sink is None:
+                return view(*args, **kwargs)
+
+            start = time.time()
+            started = time.perf_counter()
+            response = make_response(view(*args, **kwargs))
+            duration = time.perf_counter() - started
+
+            body = request.get_json(silent=True)
+            try:
+                record = {
+                    "time": start,
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "duration": duration,
+                    "replayed": "Idempotent-Replay" in response.headers,
+                    "body": redact(body, schema) if isinstance(body, dict) else None,
+                }
+            except Exception as e:
+                print(f"Failed to capture {request.path}: {e}")
+                return response
+            sink.write(record)
+            return response
+
+        return wrapper
+
+    return decorate
+
+
+def _backups():
+    return int(os.getenv("CAPTURE_BACKUPS", 5))
+
+
+def get_capture_sink():
+    """None unless CAPTURE_PATH is set, nothing is captured then."""
+    global _sink
+    if _sink is None:
+        path = os.getenv("CAPTURE_PATH", "")
+        if not path:
+            return None
+        with _lock:
+            if _sink is None:
+                _sink = JsonlSink(
+                    path,
+                    int(os.getenv("CAPTURE_MAX_BYTES", 20 * 1024 * 1024)),
+                    backups=_backups(),
+                    what="captured request",
+                )
+    return _sink
+
+
+def read_corpus(path, backups=None):
+    """Captured requests of the rotated files and the current one, in time order."""
+    records = read_jsonl(path, _backups() if backups is None else backups)
+    return sorted(records, key=lambda record: record["time"])
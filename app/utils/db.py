@@ -1,29 +1,599 @@
 # app/utils/db.py
 import os
+import json
+import asyncio
+import time
+import contextvars
+import threading
 import requests
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
-def get_staff(payload):
+from app.utils.json_body import JsonBody
+from app.utils.metrics import timed
+from app.utils.multipart import MultipartBody
+from app.utils.staff import Staff
+
+_session = None
+_executor = None
+_staff_cache = None
+_staff_flight = None
+_lock = threading.Lock()
+
+
+def _pool_size():
+    return int(os.getenv("BACKEND_POOL_SIZE", 10))
+
+
+def _timeout():
+    """(connect, read) timeout tuple for every backend call."""
+    return (
+        float(os.getenv("BACKEND_CONNECT_TIMEOUT", 3)),
+        float(os.getenv("BACKEND_READ_TIMEOUT", 10)),
+    )
+
+
+def get_session():
+    """
+    Returns the shared keep-alive session for the backend.
+    Built lazily so the .env file is loaded before we read the pool size.
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=_pool_size(),
+                    pool_block=True,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def _get_executor():
+    # Sized to the connection pool, so coroutines never queue on a socket
+    # while holding a thread.
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_pool_size(), thread_name_prefix="backend"
+                )
+    return _executor
+
+
+def backend_request(method, path, payload=None, params=None, body=None):
+    """
+    Sends a request to BACKEND_ENDPOINT through the pooled session.
+    payload is sent as JSON, or pass a MultipartBody as body to stream it.
+    Returns the response, or None if the backend could not be reached.
+    """
     headers = {"Authorization": f"Bearer {os.getenv('AUTH_TOKEN', '')}"}
-    response = requests.post(
-        url=f"{os.getenv("BACKEND_ENDPOINT")}/staff/getstaffs",
-        headers=headers,
-        json=payload,
+    if body is not None:
+        headers["Content-Type"] = body.content_type
+    # /staff/update/<uuid> -> /staff/update, one series per endpoint
+    with timed("backend", "/".join(path.split("/")[:3])) as call:
+        try:
+            response = get_session().request(
+                method,
+                url=f"{os.getenv("BACKEND_ENDPOINT")}{path}",
+                headers=headers,
+                json=payload,
+                data=body,
+                params=params,
+                timeout=_timeout(),
+            )
+        except requests.RequestException as e:
+            print(f"Backend request {method} {path} failed: {e}")
+            call.ok = False
+            return None
+        call.ok = response.status_code < 500
+        return response
+
+
+class StaffCache:
+    """
+    In-process TTL/LRU cache for single staff lookups.
+    Records are stored once under their uuid, discord_id is an alias pointing
+    to that uuid, so both kinds of lookup share one entry.
+    """
+
+    CACHEABLE_KEYS = ("uuid", "discord_id")
+
+    def __init__(self, ttl=60, max_entries=512, max_bytes=8 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # uuid -> (expires_at, record, size)
+        self._aliases = {}  # discord_id -> uuid
+        self._bytes = 0
+        # Bumped on every invalidation so a lookup that started before a
+        # write can't put the old record back afterwards.
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def _key(self, payload):
+        if not isinstance(payload, dict) or len(payload) != 1:
+            return None, None
+        field, value = next(iter(payload.items()))
+        if field not in self.CACHEABLE_KEYS or not value:
+            return None, None
+        return field, str(value)
+
+    def get(self, payload, fields=None):
+        """
+        Returns the cached record for payload, or None. A record cached from
+        a projected lookup only answers lookups asking for a subset of it.
+        """
+        field, value = self._key(payload)
+        if field is None:
+            return None
+
+        with self._lock:
+            uuid = self._aliases.get(value) if field == "discord_id" else value
+            entry = self._entries.get(uuid) if uuid else None
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(uuid)
+                self.misses += 1
+                return None
+            if not entry[1].covers(fields):
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(uuid)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, payload, records, size, generation=None):
+        field, _ = self._key(payload)
+        if field is None or len(records) != 1:
+            return
+
+        record = records[0]
+        uuid = record.uuid
+        if not uuid or size > self.max_bytes:
+            return
+
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            # Don't replace a full record with a projected one.
+            cached = self._entries.get(uuid)
+            if cached is not None and not record.covers(cached[1].fields):
+                return
+            self._remove(uuid)
+            self._entries[uuid] = (time.monotonic() + self.ttl, record, size)
+            self._bytes += size
+            if record.discord_id:
+                self._aliases[record.discord_id] = uuid
+
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, uuid):
+        with self._lock:
+            self.generation += 1
+            self._remove(uuid)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._aliases.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def _remove(self, uuid):
+        # Caller holds the lock.
+        entry = self._entries.pop(uuid, None)
+        if entry is None:
+            return
+        self._bytes -= entry[2]
+        discord_id = entry[1].discord_id
+        if discord_id and self._aliases.get(discord_id) == uuid:
+            del self._aliases[discord_id]
+
+
+def get_staff_cache():
+    global _staff_cache
+    if _staff_cache is None:
+        with _lock:
+            if _staff_cache is None:
+                _staff_cache = StaffCache(
+                    ttl=float(os.getenv("STAFF_CACHE_TTL", 60)),
+                    max_entries=int(os.getenv("STAFF_CACHE_MAX_ENTRIES", 512)),
+                    max_bytes=int(os.getenv("STAFF_CACHE_MAX_BYTES", 8 * 1024 * 1024)),
+                )
+    return _staff_cache
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls sharing a key into one call, and every caller
+    gets the same result. do() is for threads, do_async() for coroutines.
+    `saved` counts the calls that didn't have to run.
+    """
+
+    def __init__(self):
+        self.saved = 0
+        self._calls = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.saved += 1
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def do_async(self, key, func, *args):
+        loop = asyncio.get_running_loop()
+        # Tasks belong to one loop, Flask's async views run on their own.
+        task_key = (id(loop), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            if task is None:
+                task = loop.create_task(func(*args))
+                self._tasks[task_key] = task
+                task.add_done_callback(
+                    lambda done: self._forget(task_key, done)
+                )
+            else:
+                self.saved += 1
+
+        # Shielded so one caller being cancelled doesn't cancel the others.
+        return await asyncio.shield(task)
+
+    def _forget(self, task_key, task):
+        with self._lock:
+            if self._tasks.get(task_key) is task:
+                del self._tasks[task_key]
+
+
+def get_staff_flight():
+    global _staff_flight
+    if _staff_flight is None:
+        with _lock:
+            if _staff_flight is None:
+                _staff_flight = SingleFlight()
+    return _staff_flight
+
+
+def _staff_key(payload, fields):
+    return json.dumps(
+        [payload, sorted(fields) if fields else None], sort_keys=True, default=str
     )
 
-    if response.status_code != 200:
+
+def _fetch_staff(payload, fields):
+    cache = get_staff_cache()
+    generation = cache.generation
+    params = {"fields": ",".join(fields)} if fields else None
+    response = backend_request("POST", "/staff/getstaffs", payload, params)
+
+    if response is None or response.status_code != 200:
         return False, None
-    return True, response
 
+    try:
+        records = Staff.from_response(response.json(), fields)
+    except ValueError:
+        print(f"Backend returned invalid JSON: {response.text[:200]}")
+        return False, None
 
-def update_staff(uuid, payload):
-    headers = {"Authorization": f"Bearer {os.getenv('AUTH_TOKEN', '')}"}
-    response = requests.post(
-        url=f"{os.getenv("BACKEND_ENDPOINT")}/staff/update/{uuid}",
-        headers=headers,
-        json=payload,
+    cache.put(payload, records, len(response.content), generation)
+    return True, records
+
+
+def get_staff(payload, use_cache=True, fields=None):
+    """
+    Returns (is_valid, [Staff, ...]), the list is empty if nothing matched.
+
+    `fields` limits which fields the backend sends, e.g. PERMISSION_FIELDS
+    for permission checks. Single lookups by uuid or discord_id are served
+    from the staff cache when possible, pass use_cache=False to always ask
+    the backend. Identical lookups already in flight share one request.
+    """
+    if use_cache:
+        record = get_staff_cache().get(payload, fields)
+        if record is not None:
+            return True, [record]
+
+    return get_staff_flight().do(
+        _staff_key(payload, fields), _fetch_staff, payload, fields
     )
 
-    if response.status_code != 200:
+
+def get_staff_page(payload, fields=None, page=1, cursor=None, page_size=None):
+    """
+    Fetches one page of a listing query.
+    Returns (is_valid, [Staff, ...], next_cursor). next_cursor is only set
+    when the backend pages by cursor instead of page number.
+    """
+    params = {"page_size": page_size or _page_size()}
+    if cursor:
+        params["cursor"] = cursor
+    else:
+        params["page"] = page
+    if fields:
+        params["fields"] = ",".join(fields)
+
+    response = backend_request("POST", "/staff/getstaffs", payload, params)
+    if response is None or response.status_code != 200:
+        return False, None, None
+
+    try:
+        body = response.json()
+    except ValueError:
+        print(f"Backend returned invalid JSON: {response.text[:200]}")
+        return False, None, None
+    return True, Staff.from_response(body, fields), body.get("next_cursor")
+
+
+def _page_size():
+    return int(os.getenv("STAFF_PAGE_SIZE", 50))
+
+
+class _PageWalker:
+    """
+    Decides when a paged listing is finished. The backend may ignore the
+    paging parameters and send everything at once, so we also stop on a
+    short page, an oversized page, a page with nothing new in it, or a
+    cursor we were just given.
+    """
+
+    def __init__(self, page_size):
+        self.page_size = page_size
+        self.page = 1
+        self.cursor = None
+        self.seen = set()
+        self.done = False
+
+    def feed(self, records, next_cursor):
+        new = [record for record in records if record.uuid not in self.seen]
+        self.seen.update(record.uuid for record in new)
+
+        if not new or (next_cursor and next_cursor == self.cursor):
+            # An echoed page or a repeated cursor would go round forever
+            self.done = True
+        elif next_cursor:
+            self.cursor = next_cursor
+        elif len(records) != self.page_size:
+            self.done = True
+        self.page += 1
+        return new
+
+
+def _with_uuid(fields):
+    # The walker tells pages apart by uuid.
+    if fields and "uuid" not in fields:
+        return ("uuid",) + tuple(fields)
+    return fields
+
+
+def iter_staff(payload, fields=None, page_size=None):
+    """
+    Yields matching staff records page by page, so callers that stop early
+    (e.g. a full embed) never download the rest of the listing.
+    """
+    fields = _with_uuid(fields)
+    walker = _PageWalker(page_size or _page_size())
+    while not walker.done:
+        is_valid, records, next_cursor = get_staff_page(
+            payload, fields, walker.page, walker.cursor, walker.page_size
+        )
+        if not is_valid:
+            return
+        yield from walker.feed(records, next_cursor)
+
+
+def _post_update(uuid, payload=None, body=None):
+    # Invalidate on both sides of the write: a lookup racing with us could
+    # otherwise cache the old record again, and if the write fails we can't
+    # tell what the backend ended up storing.
+    cache = get_staff_cache()
+    cache.invalidate(uuid)
+    response = backend_request("POST", f"/staff/update/{uuid}", payload, body=body)
+    cache.invalidate(uuid)
+    return response
+
+
+def update_staff(uuid, payload):
+    response = _post_update(uuid, payload)
+
+    if response is None or response.status_code != 200:
+        if response is not None:
+            print(response.text)
+        return False
+    return True
+
+
+# What a backend without multipart support answers, we then resend as JSON.
+MULTIPART_UNSUPPORTED = (404, 405, 415, 501)
+
+
+def _upload_mode():
+    return os.getenv("BACKEND_IMAGE_UPLOAD", "json").lower()
+
+
+def _multipart_update(uuid, payload, images):
+    """
+    Sends the record as a JSON "data" part and every image as its own raw
+    part. The record refers to an image as "cid:<part name>".
+    """
+    record = dict(payload)
+    parts = []
+    for field, sides in images.items():
+        record[field] = {}
+        for side, image in sides.items():
+            if not image:
+                # Not uploaded by the applicant, null as in the JSON update
+                record[field][side] = None
+                continue
+            name = f"{field}.{side}"
+            record[field][side] = f"cid:{name}"
+            parts.append((name, image))
+
+    body = MultipartBody()
+    body.add_json("data", record)
+    for name, image in parts:
+        body.add(name, image["data"], image["mime_type"], filename=name)
+    return _post_update(uuid, body=body)
+
+
+def update_staff_with_images(uuid, payload, images):
+    """
+    Updates a staff record together with its ID images.
+    images is {"student_card": {"front": image, "back": image}, ...}, image
+    being what app.utils.image.fetch_image returns, or None for an image
+    the applicant didn't upload.
+
+    BACKEND_IMAGE_UPLOAD=multipart uploads the raw bytes, skipping the
+    base64 overhead. Otherwise, or when the backend turns multipart down,
+    the images are inlined as base64 like update_staff always did, streamed
+    so no full base64 copy of them is ever built.
+    """
+    if _upload_mode() == "multipart":
+        response = _multipart_update(uuid, payload, images)
+        if response is not None and response.status_code == 200:
+            return True
+        if response is None or response.status_code not in MULTIPART_UNSUPPORTED:
+            if response is not None:
+                print(response.text)
+            return False
+        print(f"Backend refused multipart ({response.status_code}), sending JSON")
+
+    # Same JSON as before, the base64 is encoded while the body is sent
+    record = dict(payload)
+    for field, sides in images.items():
+        record[field] = {
+            side: image["data"] if image else None for side, image in sides.items()
+        }
+    response = _post_update(uuid, body=JsonBody(record))
+
+    if response is None or response.status_code != 200:
+        if response is not None:
+            print(response.text)
+        return False
+    return True
+
+
+def create_staff(payload):
+    response = backend_request("POST", "/staff/create/new", payload)
+
+    if response is None or response.status_code != 201:
+        if response is not None:
+            print(response.text)
+        return False, None
+    return True, response
+
+
+def send_verify_email(uuid):
+    """Asks the backend to send the cloudflare verification email."""
+    response = backend_request("POST", f"/staff/send/verify/{uuid}")
+
+    if response is None or response.status_code != 200:
+        if response is not None:
+            print(response.text)
         return False
     return True
+
+
+async def _run_async(func, *args):
+    loop = asyncio.get_running_loop()
+    # Executors don't carry context variables over, copy them (call site)
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_get_executor(), context.run, func, *args)
+
+
+# Async versions for the discord bot, these never block the event loop.
+async def get_staff_async(payload, use_cache=True, fields=None):
+    if use_cache:
+        record = get_staff_cache().get(payload, fields)
+        if record is not None:
+            return True, [record]
+
+    flight = get_staff_flight()
+    key = _staff_key(payload, fields)
+    return await flight.do_async(
+        key, _run_async, flight.do, key, _fetch_staff, payload, fields
+    )
+
+
+async def update_staff_async(uuid, payload):
+    return await _run_async(update_staff, uuid, payload)
+
+
+async def create_staff_async(payload):
+    return await _run_async(create_staff, payload)
+
+
+async def send_verify_email_async(uuid):
+    return await _run_async(send_verify_email, uuid)
+
+
+async def iter_staff_async(payload, fields=None, page_size=None):
+    fields = _with_uuid(fields)
+    walker = _PageWalker(page_size or _page_size())
+    while not walker.done:
+        is_valid, records, next_cursor = await _run_async(
+            get_staff_page,
+            payload,
+            fields,
+            walker.page,
+            walker.cursor,
+            walker.page_size,
+        )
+        if not is_valid:
+            return
+        for record in walker.feed(records, next_cursor):
+            yield record
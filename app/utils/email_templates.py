@@ -0,0 +1,202 @@
+# app/utils/email_templates.py
+import os
+import re
+import html
+import threading
+
+from functools import lru_cache
+from html.parser import HTMLParser
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
+
+_environment = None
+_lock = threading.Lock()
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "wbr"}
+STYLE_BLOCK = re.compile(r"<style[^>]*>(.*?)</style>", re.S | re.I)
+# tag, .class or tag.class, and descendant chains of them
+SIMPLE_SELECTOR = re.compile(r"^[a-z0-9]*(\.[\w-]+)*$", re.I)
+
+
+def _parse_css(css):
+    """[(selector, declarations)] in source order."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    return [
+        (selector.strip(), " ".join(body.split()).rstrip(";"))
+        for selectors, body in re.findall(r"([^{}]+)\{([^{}]*)\}", css)
+        for selector in selectors.split(",")
+    ]
+
+
+def _compile_selector(selector):
+    """[(tag or None, {classes})] from outermost to innermost, None if not inlinable."""
+    parts = selector.split()
+    if not parts or not all(SIMPLE_SELECTOR.match(part) for part in parts):
+        return None
+    compiled = []
+    for part in parts:
+        tag, *classes = part.split(".")
+        compiled.append((tag.lower() or None, set(classes)))
+    return compiled
+
+
+def _matches(simple, tag, classes):
+    want_tag, want_classes = simple
+    return (want_tag is None or want_tag == tag) and want_classes <= classes
+
+
+def _selector_matches(compiled, stack):
+    """stack is [(tag, classes)] of open elements, the last one being tested."""
+    if not _matches(compiled[-1], *stack[-1]):
+        return False
+    ancestors = stack[:-1]
+    for simple in reversed(compiled[:-1]):
+        while ancestors and not _matches(simple, *ancestors[-1]):
+            ancestors = ancestors[:-1]
+        if not ancestors:
+            return False
+        ancestors = ancestors[:-1]
+    return True
+
+
+class _Inliner(HTMLParser):
+    def __init__(self, source, rules):
+        super().__init__(convert_charrefs=False)
+        self.source = source
+        self.rules = rules
+        self.stack = []
+        self.edits = []
+        self._line_starts = [0] + [m.end() for m in re.finditer("\n", source)]
+
+    def handle_starttag(self, tag, attrs):
+        classes = set((dict(attrs).get("class") or "").split())
+        self.stack.append((tag, classes))
+
+        matched = [
+            (specificity, order, declarations)
+            for order, (compiled, specificity, declarations) in enumerate(self.rules)
+            if _selector_matches(compiled, self.stack)
+        ]
+        if matched:
+            line, column = self.getpos()
+            start = self._line_starts[line - 1] + column
+            text = self.get_starttag_text()
+            style = "; ".join(d for _, _, d in sorted(matched))
+            self.edits.append((start, len(text), self._rewrite(tag, attrs, style, text)))
+
+        if tag in VOID_TAGS:
+            self.stack.pop()
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.stack.pop()
+
+    def handle_endtag(self, tag):
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                del self.stack[i:]
+                break
+
+    @staticmethod
+    def _rewrite(tag, attrs, style, text):
+        # An existing style attribute wins over the stylesheet
+        existing = dict(attrs).get("style")
+        style = f"{style}; {existing}" if existing else style
+        parts = [tag]
+        for name, value in attrs:
+            if name == "style":
+                continue
+            parts.append(name if value is None else f'{name}="{html.escape(value)}"')
+        parts.append(f'style="{html.escape(style)}"')
+        closing = "/>" if text.endswith("/>") else ">"
+        return f"<{' '.join(parts)}{closing}"
+
+
+def inline_css(source):
+    """
+    Moves the rules of the template's <style> blocks onto the elements'
+    style attributes, for mail clients that ignore <style>. Only tag/class
+    selectors and descendant chains of them are inlined, anything else
+    (:hover, @media) stays in <style> for the clients that support it.
+    Jinja expressions pass through untouched.
+    """
+    rules, kept = [], []
+    for block in STYLE_BLOCK.findall(source):
+        for selector, declarations in _parse_css(block):
+            compiled = _compile_selector(selector)
+            if compiled is None:
+                kept.append(f"{selector} {{ {declarations} }}")
+                continue
+            classes = sum(len(c) for _, c in compiled)
+            tags = sum(1 for t, _ in compiled if t)
+            rules.append((compiled, (classes, tags), declarations))
+    if not rules:
+        return source
+
+    inliner = _Inliner(source, rules)
+    inliner.feed(source)
+    inliner.close()
+
+    for start, length, replacement in reversed(inliner.edits):
+        source = source[:start] + replacement + source[start + length :]
+
+    style = f"<style>\n{chr(10).join(kept)}\n</style>" if kept else ""
+    source = STYLE_BLOCK.sub("", source)
+    return source.replace("</head>", f"{style}\n</head>", 1) if style else source
+
+
+class EmailTemplateLoader(FileSystemLoader):
+    """Loads templates under emails/ with their CSS already inlined."""
+
+    def get_source(self, environment, template):
+        source, filename, uptodate = super().get_source(environment, template)
+        if template.startswith("emails/"):
+            source = inline_css(source)
+        return source, filename, uptodate
+
+
+def get_email_environment():
+    """
+    Jinja environment for emails, separate from Flask's so rendering needs
+    no app context. Compiled templates are kept in memory and their
+    bytecode on disk (EMAIL_TEMPLATE_CACHE_DIR), so a restart doesn't
+    compile them again.
+    """
+    global _environment
+    if _environment is None:
+        with _lock:
+            if _environment is None:
+                cache_dir = os.getenv("EMAIL_TEMPLATE_CACHE_DIR", ".jinja_cache")
+                os.makedirs(cache_dir, exist_ok=True)
+                _environment = Environment(
+                    loader=EmailTemplateLoader(TEMPLATE_DIR),
+                    autoescape=select_autoescape(["html"]),
+                    bytecode_cache=FileSystemBytecodeCache(cache_dir),
+                    auto_reload=os.getenv("DEBUG") == "True",
+                )
+    return _environment
+
+
+def precompile_email_templates():
+    """Loads every email template up front, call once at startup."""
+    environment = get_email_environment()
+    names = environment.list_templates(filter_func=lambda name: name.startswith("emails/"))
+    for name in names:
+        environment.get_template(name)
+    return names
+
+
+def render_email(template, **kwargs):
+    return get_email_environment().get_template(template).render(**kwargs)
+
+
+@lru_cache(maxsize=256)
+def _render_memoized(template, params):
+    return render_email(template, **dict(params))
+
+
+def render_email_cached(template, **kwargs):
+    """render_email memoized on (template, params), for the preview page."""
+    return _render_memoized(template, tuple(sorted(kwargs.items())))
@@ -0,0 +1,101 @@
+# app/utils/form_schema.py
+
+
+def text(value):
+    return value
+
+
+def phone(value):
+    """+886912345678 -> 0912345678, the backend wants it without the prefix."""
+    if not isinstance(value, str) or not value:
+        return None
+    return "0" + value[4:]
+
+
+def file_url(value):
+    return value.get("url") if isinstance(value, dict) else None
+
+
+def choices(mapping):
+    """Multiple choice, the selected option ids mapped to their names."""
+
+    def coerce(value):
+        ids = value.get("value", []) if isinstance(value, dict) else []
+        return [mapping.get(option_id, option_id) for option_id in ids or []]
+
+    coerce.options = mapping
+    return coerce
+
+
+def choice(mapping):
+    """Single choice, the first selected option id mapped to its name."""
+    many = choices(mapping)
+
+    def coerce(value):
+        selected = many(value)
+        return selected[0] if selected else None
+
+    coerce.options = mapping
+    return coerce
+
+
+class Field:
+    __slots__ = ("name", "field_id", "coerce", "default")
+
+    def __init__(self, name, field_id, coerce=text, default=None):
+        self.name = name
+        self.field_id = field_id
+        self.coerce = coerce
+        self.default = default
+
+
+class FormSchema:
+    """
+    Maps a form's answers ([{"id": ..., "value": ...}, ...]) to named values.
+
+    The field_id -> Field table is built once, so each answer costs one dict
+    lookup and its coercer. Fields whose id isn't configured (env var unset)
+    are left out of the table and keep their default.
+    """
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        # field_id -> (name, coercer), None standing for plain text
+        self._dispatch = {
+            field.field_id: (field.name, None if field.coerce is text else field.coerce)
+            for field in fields
+            if field.field_id
+        }
+        self._defaults = {field.name: field.default for field in fields}
+        self._list_fields = [
+            field.name for field in fields if isinstance(field.default, list)
+        ]
+
+    def parse(self, answers):
+        """
+        Returns ({name: value}, unknown), unknown being the ids of answers
+        the schema has no field for. A repeated id keeps its last value.
+        """
+        values = self._defaults.copy()
+        for name in self._list_fields:
+            values[name] = []
+        dispatch = self._dispatch
+        unknown = []
+        for answer in answers:
+            entry = dispatch.get(answer.get("id"))
+            if entry is None:
+                unknown.append(answer.get("id"))
+                continue
+            name, coerce = entry
+            value = answer.get("value")
+            values[name] = value if coerce is None else coerce(value)
+
+        if unknown:
+            print(f"{self.name}: ignoring unknown fields {unknown}")
+        return values, unknown
+
+    def options(self, field_id):
+        """The option id -> name mapping of a choice field, None for other fields."""
+        entry = self._dispatch.get(field_id)
+        return getattr(entry[1], "options", None) if entry else None
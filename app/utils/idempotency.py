@@ -0,0 +1,101 @@
+# app/utils/idempotency.py
+import os
+import time
+import sqlite3
+import threading
+
+_idempotency_store = None
+_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    key TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    status_code INTEGER,
+    body BLOB,
+    mimetype TEXT,
+    claimed_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS requests_expires_at ON requests (expires_at);
+"""
+
+
+class IdempotencyStore:
+    """
+    Remembers the response to each webhook submission for `ttl` seconds,
+    so a retried delivery gets the original answer instead of being
+    processed again.
+
+    begin() claims a key. The caller either finish()es it with the response
+    to replay, or release()s it when the request failed and a retry should
+    run for real. A claim that is neither finished nor released within
+    `lease` seconds (the process died) can be taken over.
+    """
+
+    def __init__(self, path="idempotency.db", ttl=3 * 24 * 3600, lease=120):
+        self.ttl = ttl
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript(SCHEMA)
+
+    def begin(self, key):
+        """
+        Returns None if the key is now ours, otherwise the stored row:
+        status "done" with the response to replay, or "pending" while the
+        first delivery is still being handled.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("DELETE FROM requests WHERE expires_at < ?", (now,))
+                row = self._db.execute(
+                    "SELECT * FROM requests WHERE key = ?", (key,)
+                ).fetchone()
+                if row and not (
+                    row["status"] == "pending" and row["claimed_at"] < now - self.lease
+                ):
+                    self._db.execute("COMMIT")
+                    return dict(row)
+
+                self._db.execute(
+                    "INSERT OR REPLACE INTO requests"
+                    " (key, status, claimed_at, expires_at) VALUES (?, 'pending', ?, ?)",
+                    (key, now, now + self.ttl),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return None
+
+    def finish(self, key, status_code, body, mimetype):
+        with self._lock:
+            self._db.execute(
+                "UPDATE requests SET status = 'done', status_code = ?, body = ?,"
+                " mimetype = ? WHERE key = ?",
+                (status_code, body, mimetype, key),
+            )
+
+    def release(self, key):
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM requests WHERE key = ? AND status = 'pending'", (key,)
+            )
+
+
+def get_idempotency_store():
+    global _idempotency_store
+    if _idempotency_store is None:
+        with _lock:
+            if _idempotency_store is None:
+                _idempotency_store = IdempotencyStore(
+                    path=os.getenv("IDEMPOTENCY_PATH", "idempotency.db"),
+                    ttl=float(os.getenv("IDEMPOTENCY_TTL", 3 * 24 * 3600)),
+                )
+    return _idempotency_store
@@ -1,19 +1,292 @@
 # app/utils/image.py
+import os
+import io
 import base64
-import mimetypes
+import threading
+import contextvars
+import multiprocessing
 import requests
 
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from requests.adapters import HTTPAdapter
+from PIL import Image, ImageOps
 
-def image_url_to_base64(image_url):
-    response = requests.get(image_url)
+from app.utils.image_cache import get_image_cache, sha256
+from app.utils.metrics import timed
+
+CHUNK_SIZE = 64 * 1024
+
+_session = None
+_executor = None
+_process_pool = None
+_lock = threading.Lock()
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+def _workers():
+    return int(os.getenv("IMAGE_FETCH_WORKERS", 4))
+
+
+def _max_bytes():
+    return int(os.getenv("IMAGE_MAX_BYTES", 10 * 1024 * 1024))
+
+
+def get_session():
+    """Shared keep-alive session for downloading form uploads."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_maxsize=_workers())
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_workers(), thread_name_prefix="image-fetch"
+                )
+    return _executor
+
+
+def _normalize_workers():
+    # Encoding is CPU bound, one process per core unless told otherwise
+    return int(os.getenv("IMAGE_NORMALIZE_WORKERS", 0)) or os.cpu_count() or 2
+
+
+def _get_process_pool():
+    # Spawned rather than forked, the web process already runs threads.
+    # Spawned children import the main script again, asgi.py, run.py and
+    # bot.py skip building the app when imported as __mp_main__.
+    global _process_pool
+    if _process_pool is None:
+        with _lock:
+            if _process_pool is None:
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=_normalize_workers(),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _process_pool
+
+
+def normalize_enabled():
+    return os.getenv("IMAGE_NORMALIZE", "true").lower() in ["true", "on", "1"]
+
+
+def _normalize_settings():
+    """(max_dimension, format, quality), or None when normalizing is off."""
+    if not normalize_enabled():
+        return None
+    image_format = os.getenv("IMAGE_FORMAT", "WEBP").upper()
+    return (
+        int(os.getenv("IMAGE_MAX_DIMENSION", 1600)),
+        "JPEG" if image_format in ("JPG", "JPEG") else "WEBP",
+        int(os.getenv("IMAGE_QUALITY", 80)),
+    )
+
+
+def sniff_mime_type(head):
+    """Detects the image type from its first bytes, None if it isn't an image."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return "image/heic"
+    if head.startswith(b"BM"):
+        return "image/bmp"
+    return None
 
-    if response.status_code != 200:
-        return False
 
-    mime_type, _ = mimetypes.guess_type(image_url)
-    if not mime_type or not mime_type.startswith('image/'):
+def iter_image(image_url, max_bytes=None):
+    """
+    Streams an image download in chunks, checking the type from the magic
+    bytes and aborting once it goes over max_bytes.
+    Yields the MIME type first, then the body chunks.
+    """
+    max_bytes = max_bytes or _max_bytes()
+    timeout = float(os.getenv("IMAGE_FETCH_TIMEOUT", 20))
+
+    with get_session().get(image_url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+
+        length = response.headers.get("Content-Length")
+        if length and length.isdigit() and int(length) > max_bytes:
+            raise ImageTooLarge(f"{image_url} is {length} bytes")
+
+        chunks = response.iter_content(CHUNK_SIZE)
+        head = b""
+        for chunk in chunks:
+            head += chunk
+            if len(head) >= 12:
+                break
+
+        mime_type = sniff_mime_type(head)
+        if mime_type is None:
+            raise ValueError(f"{image_url} is not an image")
+        yield mime_type
+
+        received = len(head)
+        if received > max_bytes:
+            raise ImageTooLarge(f"{image_url} is over {max_bytes} bytes")
+        yield head
+        for chunk in chunks:
+            received += len(chunk)
+            if received > max_bytes:
+                raise ImageTooLarge(f"{image_url} is over {max_bytes} bytes")
+            yield chunk
+
+
+def normalize_image(data, max_dimension, image_format, quality):
+    """
+    Downscales an image so neither side exceeds max_dimension, drops EXIF
+    and other metadata, and re-encodes it as WEBP or JPEG.
+    Runs in the process pool. Returns (bytes, mime type).
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        # Phone photos are often stored sideways with an EXIF rotation,
+        # apply it before the EXIF is dropped.
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        output = io.BytesIO()
+        image.save(output, format=image_format, quality=quality, optimize=True)
+
+    return output.getvalue(), f"image/{image_format.lower()}"
+
+
+def _discard_process_pool(pool):
+    """Forgets a broken pool, the next image starts a new one."""
+    global _process_pool
+    with _lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _encode(image_url, data, mime_type, settings):
+    if settings is None:
+        return data, mime_type
+    pool = _get_process_pool()
+    try:
+        with timed("image", "normalize"):
+            future = pool.submit(normalize_image, data, *settings)
+            return future.result(
+                timeout=float(os.getenv("IMAGE_NORMALIZE_TIMEOUT", 30))
+            )
+    except BrokenProcessPool as e:
+        # A worker died (out of memory, a crash in Pillow), and the pool
+        # refuses all work from then on
+        _discard_process_pool(pool)
+        print(f"Could not normalize {image_url}, keeping original: {e}")
+        return data, mime_type
+    except TimeoutError:
+        # Still queued behind other images, don't encode it for nobody
+        future.cancel()
+        print(f"Normalizing {image_url} timed out, keeping original")
+        return data, mime_type
+    except Exception as e:
+        # e.g. HEIC, which Pillow can't read: keep the original
+        print(f"Could not normalize {image_url}, keeping original: {e}")
+        return data, mime_type
+
+
+def fetch_image(image_url):
+    """
+    Downloads one image and normalizes it when IMAGE_NORMALIZE is on.
+    Returns {"data", "mime_type", "original_bytes", "bytes", "sha256"} or
+    False, data being the raw bytes to upload and sha256 their hash.
+
+    Goes through the image cache first: a URL seen before is neither
+    downloaded nor re-encoded, and bytes seen before under another URL
+    (a resubmission) are not re-encoded. Form upload URLs are unique per
+    upload, so a URL's content isn't expected to change.
+    """
+    settings = _normalize_settings()
+    variant = ":".join(map(str, settings)) if settings else "original"
+    cache = get_image_cache()
+
+    if cache:
+        cached = cache.get_url(image_url, variant)
+        if cached:
+            return cached
+
+    try:
+        with timed("image", "fetch"):
+            stream = iter_image(image_url)
+            mime_type = next(stream)
+            # Grown in place, joining the chunks would briefly hold it twice
+            data = bytearray()
+            for chunk in stream:
+                data += chunk
+    except (requests.RequestException, ValueError, ImageTooLarge) as e:
+        print(f"Failed to fetch image {image_url}: {e}")
         return False
 
-    base64_encoded = base64.b64encode(response.content).decode("utf-8")
+    source_hash = sha256(data)
+    if cache:
+        cached = cache.get_source(source_hash, variant)
+        if cached:
+            cache.remember_url(image_url, source_hash)
+            return cached
+
+    encoded, encoded_type = _encode(image_url, data, mime_type, settings)
+    image = {
+        "data": encoded,
+        "mime_type": encoded_type,
+        "original_bytes": len(data),
+        "bytes": len(encoded),
+    }
+    if cache:
+        image["sha256"] = cache.put(image_url, source_hash, variant, image)
+    else:
+        image["sha256"] = sha256(encoded)
+    return image
+
+
+def image_url_to_base64(image_url):
+    image = fetch_image(image_url)
+    return base64.b64encode(image["data"]).decode("ascii") if image else False
+
+
+def fetch_images(image_urls):
+    """
+    Downloads and normalizes several images concurrently.
+    Takes {name: url}, returns ({name: image or False}, report) where image
+    is what fetch_image returns and report has the total original and
+    uploaded sizes, and how many images came from the cache.
+    """
+    executor = _get_executor()
+    futures = {
+        name: executor.submit(contextvars.copy_context().run, fetch_image, url)
+        for name, url in image_urls.items()
+    }
 
-    return base64_encoded
+    images = {}
+    report = {"original_bytes": 0, "bytes": 0, "cached": 0}
+    for name, future in futures.items():
+        image = future.result()
+        images[name] = image
+        if image:
+            report["original_bytes"] += image["original_bytes"]
+            report["bytes"] += image["bytes"]
+            report["cached"] += image.get("cached", False)
+    report["saved_bytes"] = report["original_bytes"] - report["bytes"]
+    return images, report
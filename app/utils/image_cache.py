@@ -0,0 +1,285 @@
+# app/utils/image_cache.py
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+_image_cache = None
+_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    mime_type TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blobs_last_used ON blobs (last_used);
+CREATE TABLE IF NOT EXISTS sources (
+    hash TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    blob TEXT NOT NULL,
+    original_bytes INTEGER NOT NULL,
+    PRIMARY KEY (hash, variant)
+);
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS uploaded (
+    uuid TEXT NOT NULL,
+    slot TEXT NOT NULL,
+    blob TEXT NOT NULL,
+    PRIMARY KEY (uuid, slot)
+);
+"""
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ImageCache:
+    """
+    Content-addressed on-disk cache for downloaded ID images, so a retried
+    webhook or a resubmission doesn't download and re-encode them again.
+
+    Three lookups, all in an SQLite index next to the files:
+    - urls:    form upload URL -> SHA-256 of the downloaded bytes
+    - sources: (that hash, normalization settings) -> stored blob
+    - blobs:   SHA-256 of the bytes we upload, stored as <dir>/<hash[:2]>/<hash>
+
+    A known URL skips the download, a known source hash skips the re-encode.
+    It also remembers which blob was last uploaded for each applicant, see
+    unchanged().
+
+    The blobs are photos of ID cards, kept only as long as a retry or
+    resubmission is likely: a blob unused for ttl seconds is deleted, and
+    past max_bytes the least recently used go first. Every row pointing to
+    a deleted blob goes with it.
+    """
+
+    def __init__(self, path="image_cache", max_bytes=256 * 1024 * 1024, ttl=24 * 3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        os.makedirs(path, exist_ok=True)
+        self._db = sqlite3.connect(
+            os.path.join(path, "index.db"),
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript(SCHEMA)
+        # Whatever expired while no process was running
+        self._prune()
+
+    def _blob_path(self, blob):
+        return os.path.join(self.path, blob[:2], blob)
+
+    def _read(self, blob):
+        try:
+            with open(self._blob_path(blob), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _load(self, row):
+        """Reads the blob a sources row points to, None if it's gone."""
+        data = self._read(row["blob"])
+        if data is None:
+            return None
+        with self._lock:
+            self._db.execute(
+                "UPDATE blobs SET last_used = ? WHERE hash = ?",
+                (time.time(), row["blob"]),
+            )
+        return {
+            "data": data,
+            "mime_type": row["mime_type"],
+            "original_bytes": row["original_bytes"],
+            "bytes": len(data),
+            "sha256": row["blob"],
+            "cached": True,
+        }
+
+    def _lookup(self, where, params):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT sources.blob, sources.original_bytes, blobs.mime_type"
+                " FROM sources JOIN blobs ON blobs.hash = sources.blob"
+                f" WHERE {where}",
+                params,
+            ).fetchone()
+        return self._load(row) if row else None
+
+    def get_url(self, url, variant):
+        """The cached image for a URL we've downloaded before, or None."""
+        return self._lookup(
+            "sources.variant = ? AND sources.hash ="
+            " (SELECT hash FROM urls WHERE url = ?)",
+            (variant, url),
+        )
+
+    def get_source(self, source_hash, variant):
+        """The cached image for bytes we've already encoded, or None."""
+        return self._lookup(
+            "sources.hash = ? AND sources.variant = ?", (source_hash, variant)
+        )
+
+    def remember_url(self, url, source_hash):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO urls (url, hash) VALUES (?, ?)",
+                (url, source_hash),
+            )
+
+    def put(self, url, source_hash, variant, image):
+        """Stores an encoded image and indexes it by URL and source hash."""
+        blob = sha256(image["data"])
+        path = self._blob_path(blob)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written under a temporary name so a crash never leaves half a blob
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(image["data"])
+            os.replace(tmp, path)
+
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO blobs (hash, mime_type, size, last_used)"
+                    " VALUES (?, ?, ?, ?)",
+                    (blob, image["mime_type"], len(image["data"]), time.time()),
+                )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sources"
+                    " (hash, variant, blob, original_bytes) VALUES (?, ?, ?, ?)",
+                    (source_hash, variant, blob, image["original_bytes"]),
+                )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO urls (url, hash) VALUES (?, ?)",
+                    (url, source_hash),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+        self._prune()
+        return blob
+
+    def _prune(self):
+        """Deletes expired blobs, then the least recently used past max_bytes."""
+        cutoff = time.time() - self.ttl if self.ttl else 0
+        with self._lock:
+            total, oldest = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0), MIN(last_used) FROM blobs"
+            ).fetchone()
+            if total <= self.max_bytes and (oldest is None or oldest >= cutoff):
+                return
+            victims = []
+            # Oldest first, so the expired ones all come before the rest
+            for row in self._db.execute(
+                "SELECT hash, size, last_used FROM blobs ORDER BY last_used"
+            ).fetchall():
+                if total <= self.max_bytes and row["last_used"] >= cutoff:
+                    break
+                victims.append(row["hash"])
+                total -= row["size"]
+
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "DELETE FROM blobs WHERE hash = ?", [(v,) for v in victims]
+                )
+                self._db.executemany(
+                    "DELETE FROM sources WHERE blob = ?", [(v,) for v in victims]
+                )
+                self._db.executemany(
+                    "DELETE FROM uploaded WHERE blob = ?", [(v,) for v in victims]
+                )
+                self._db.execute(
+                    "DELETE FROM urls WHERE hash NOT IN (SELECT hash FROM sources)"
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+        for victim in victims:
+            try:
+                os.remove(self._blob_path(victim))
+            except FileNotFoundError:
+                pass
+
+    # -- what the backend already has --
+
+    def unchanged(self, uuid, images):
+        """
+        Returns the fields of images ({field: {side: image}}) whose every
+        side is exactly what was last uploaded for this applicant.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT slot, blob FROM uploaded WHERE uuid = ?", (uuid,)
+            ).fetchall()
+        uploaded = {row["slot"]: row["blob"] for row in rows}
+        return [
+            field
+            for field, sides in images.items()
+            if all(
+                image and uploaded.get(f"{field}.{side}") == image.get("sha256")
+                for side, image in sides.items()
+            )
+        ]
+
+    def mark_uploaded(self, uuid, images):
+        # Once per submission, a good time to drop what expired meanwhile
+        self._prune()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO uploaded (uuid, slot, blob) VALUES (?, ?, ?)",
+                [
+                    (uuid, f"{field}.{side}", image["sha256"])
+                    for field, sides in images.items()
+                    for side, image in sides.items()
+                    if image and image.get("sha256")
+                ],
+            )
+
+    def stats(self):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()
+        return {
+            "blobs": row[0],
+            "bytes": row[1],
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+        }
+
+
+def get_image_cache():
+    """The shared image cache, None when IMAGE_CACHE_MAX_BYTES is 0."""
+    global _image_cache
+    if _image_cache is None:
+        max_bytes = int(os.getenv("IMAGE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+        if max_bytes <= 0:
+            return None
+        with _lock:
+            if _image_cache is None:
+                _image_cache = ImageCache(
+                    path=os.getenv("IMAGE_CACHE_DIR", "image_cache"),
+                    max_bytes=max_bytes,
+                    ttl=float(os.getenv("IMAGE_CACHE_TTL", 24 * 3600)),
+                )
+    return _image_cache
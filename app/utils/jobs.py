@@ -0,0 +1,392 @@
+# app/utils/jobs.py
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+import traceback
+
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils import tracing
+from app.utils.metrics import site, timed
+
+_job_queue = None
+_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT '{}',
+    stage INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    last_error TEXT,
+    run_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_run_at ON jobs (status, run_at);
+"""
+
+# pending -> running -> done, or back to pending with a later run_at on
+# failure, or failed once max_attempts is reached.
+STATUSES = ("pending", "running", "done", "failed")
+
+
+class JobQueue:
+    """
+    Durable outbox for side effects (Discord posts, emails, backend patches),
+    backed by SQLite so nothing is lost if the process restarts.
+
+    A job is a list of named stages run in order. Each stage is called as
+    stage(data, state) and returns a dict that gets merged into state, so
+    later stages (and retries) can see what earlier ones produced. Progress
+    is written after every stage, a stage that already succeeded is never
+    run again for the same job, even across restarts. A stage that raises
+    is retried with exponential backoff.
+
+    submit() only writes the job, start() runs the dispatcher and workers.
+    With notify_path set, they can live in different processes: submit()
+    sends a datagram to that Unix socket and the process that called
+    start() wakes up right away instead of at the next poll.
+    """
+
+    def __init__(
+        self,
+        path="outbox.db",
+        workers=4,
+        max_attempts=5,
+        backoff=2.0,
+        batch_size=20,
+        poll_interval=5.0,
+        notify_path=None,
+    ):
+        self.path = path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.notify_path = notify_path
+        self._kinds = {}
+        self._traces = {}
+        self._started = False
+        self._wakeup = threading.Event()
+        self._slots = threading.Semaphore(workers)
+        self._executor = None
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript(SCHEMA)
+
+    def register(self, kind, stages, trace=None):
+        """
+        stages: list of (name, func) tuples. trace(data) returns the trace
+        id (applicant uuid) the stages' spans are filed under.
+        """
+        self._kinds[kind] = stages
+        if trace:
+            self._traces[kind] = trace
+
+    def submit(self, kind, data, job_id=None):
+        now = time.time()
+        job_id = job_id or str(uuid.uuid4())
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, data, run_at, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(data), now, now, now),
+            )
+        self._wakeup.set()
+        self._notify()
+        return job_id
+
+    def submit_many(self, kind, jobs):
+        """
+        Writes [(job_id, data), ...] in one transaction. Ids that already
+        exist are skipped, so re-submitting a batch only adds what's missing.
+        Returns the number of jobs added.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                added = 0
+                for job_id, data in jobs:
+                    added += self._db.execute(
+                        "INSERT OR IGNORE INTO jobs"
+                        " (id, kind, data, run_at, created_at, updated_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        (job_id, kind, json.dumps(data), now, now, now),
+                    ).rowcount
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        self._wakeup.set()
+        self._notify()
+        return added
+
+    def _notify(self):
+        if not self.notify_path or self._started:
+            return
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+                sock.sendto(b"1", self.notify_path)
+        except OSError:
+            # Nobody listening (bot down or restarting), it polls on startup
+            pass
+
+    def _listen(self):
+        """Wakes the dispatcher whenever another process submits a job."""
+        if os.path.exists(self.notify_path):
+            os.unlink(self.notify_path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(self.notify_path)
+        while True:
+            sock.recv(16)
+            self._wakeup.set()
+
+    def start(self):
+        """
+        Recovers jobs left running by a crash and starts draining the
+        outbox. Safe to call more than once.
+        """
+        with self._lock:
+            if self._started:
+                return
+            recovered = self._db.execute(
+                "UPDATE jobs SET status = 'pending', updated_at = ?"
+                " WHERE status = 'running'",
+                (time.time(),),
+            ).rowcount
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="job-worker"
+            )
+            threading.Thread(
+                target=self._dispatch, name="job-dispatcher", daemon=True
+            ).start()
+            if self.notify_path:
+                threading.Thread(
+                    target=self._listen, name="job-listener", daemon=True
+                ).start()
+            self._started = True
+
+        if recovered:
+            print(f"Outbox: replaying {recovered} job(s) interrupted by a restart")
+
+    # -- dispatching --
+
+    def _dispatch(self):
+        while True:
+            try:
+                jobs = self._claim(self.batch_size)
+            except sqlite3.Error as e:
+                print(f"Outbox: failed to claim jobs: {e}")
+                jobs = []
+            for job in jobs:
+                self._slots.acquire()
+                self._executor.submit(self._run_job, job)
+            if len(jobs) < self.batch_size:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _claim(self, limit):
+        """Marks up to `limit` due jobs as running, in one transaction."""
+        now = time.time()
+        kinds = list(self._kinds)
+        if not kinds:
+            return []
+        placeholders = ",".join("?" * len(kinds))
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT * FROM jobs WHERE status = 'pending' AND run_at <= ?"
+                    f" AND kind IN ({placeholders}) ORDER BY run_at LIMIT ?",
+                    (now, *kinds, limit),
+                ).fetchall()
+                self._db.executemany(
+                    "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?",
+                    [(now, row["id"]) for row in rows],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return [self._to_job(row) for row in rows]
+
+    def _run_job(self, job):
+        trace = self._traces.get(job["kind"])
+        try:
+            with tracing.trace(trace(job["data"]) if trace else None):
+                self._run(job)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self._slots.release()
+
+    def _run(self, job):
+        stages = self._kinds[job["kind"]]
+        while job["stage"] < len(stages):
+            name, func = stages[job["stage"]]
+            label = f"{job['kind']}.{name}"
+            try:
+                with site(label), timed("job_stage", label):
+                    job["state"].update(func(job["data"], job["state"]) or {})
+            except Exception as e:
+                self._fail(job, name, e)
+                return
+
+            job["stage"] += 1
+            job["attempts"] = 0
+            self._save(job, "running" if job["stage"] < len(stages) else "done")
+
+    def _fail(self, job, name, error):
+        job["attempts"] += 1
+        job["last_error"] = f"{name}: {error}"
+        if job["attempts"] >= self.max_attempts:
+            print(
+                f"Job {job['id']} ({job['kind']}) gave up at stage "
+                f"{name} after {job['attempts']} attempts: {error}"
+            )
+            self._save(job, "failed")
+            return
+
+        delay = self.backoff * 2 ** (job["attempts"] - 1)
+        print(f"Job {job['id']} stage {name} failed ({error}), retrying in {delay:g}s")
+        self._save(job, "pending", run_at=time.time() + delay)
+
+    def _save(self, job, status, run_at=None):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET state = ?, stage = ?, attempts = ?, status = ?,"
+                " last_error = ?, run_at = ?, updated_at = ? WHERE id = ?",
+                (
+                    json.dumps(job["state"]),
+                    job["stage"],
+                    job["attempts"],
+                    status,
+                    job.get("last_error"),
+                    run_at or now,
+                    now,
+                    job["id"],
+                ),
+            )
+        if status == "pending":
+            self._wakeup.set()
+
+    # -- inspection, used by the outbox CLI --
+
+    def list(self, status=None, limit=50):
+        query = "SELECT * FROM jobs"
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._to_job(row) if row else None
+
+    def counts(self):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+            ).fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def batch_counts(self, prefix):
+        """Number of jobs per status among those whose id starts with prefix."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs"
+                " WHERE substr(id, 1, ?) = ? GROUP BY status",
+                (len(prefix), prefix),
+            ).fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def retry(self, job_id=None, status="failed"):
+        """
+        Puts a job (or every job with `status`) back in the queue, starting
+        from the stage it stopped at. Returns the number of jobs re-driven.
+        Only failed or pending jobs are, a running one is left to its worker.
+        """
+        now = time.time()
+        with self._lock:
+            if job_id:
+                cursor = self._db.execute(
+                    "UPDATE jobs SET status = 'pending', attempts = 0, run_at = ?,"
+                    " updated_at = ? WHERE id = ? AND status IN ('failed', 'pending')",
+                    (now, now, job_id),
+                )
+            else:
+                cursor = self._db.execute(
+                    "UPDATE jobs SET status = 'pending', attempts = 0, run_at = ?,"
+                    " updated_at = ? WHERE status = ?",
+                    (now, now, status),
+                )
+        self._wakeup.set()
+        return cursor.rowcount
+
+    def prune(self, older_than):
+        """Deletes finished jobs older than `older_than` seconds."""
+        with self._lock:
+            return self._db.execute(
+                "DELETE FROM jobs WHERE status = 'done' AND updated_at < ?",
+                (time.time() - older_than,),
+            ).rowcount
+
+    @staticmethod
+    def _to_job(row):
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "data": json.loads(row["data"]),
+            "state": json.loads(row["state"]),
+            "stage": row["stage"],
+            "attempts": row["attempts"],
+            "status": row["status"],
+            "last_error": row["last_error"],
+            "run_at": row["run_at"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+
+def get_job_queue():
+    global _job_queue
+    if _job_queue is None:
+        with _lock:
+            if _job_queue is None:
+                _job_queue = JobQueue(
+                    path=os.getenv("OUTBOX_PATH", "outbox.db"),
+                    workers=int(os.getenv("JOB_WORKERS", 4)),
+                    max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", 5)),
+                    backoff=float(os.getenv("JOB_RETRY_BACKOFF", 2)),
+                    batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", 20)),
+                    poll_interval=float(os.getenv("OUTBOX_POLL_INTERVAL", 5)),
+                    notify_path=os.getenv("OUTBOX_SOCKET") or None,
+                )
+    return _job_queue
@@ -0,0 +1,70 @@
+# app/utils/jsonl.py
+import os
+import json
+import threading
+
+
+class JsonlSink:
+    """
+    Appends records to a JSON lines file. Every process writes to the same
+    file with O_APPEND, one write per line, so lines don't interleave.
+    Past max_bytes the file is moved to path + ".1" (the older ones to
+    ".2" and on, up to `backups`) and a new one started.
+    """
+
+    CHECK_EVERY = 256
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, backups=1, what="record"):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = max(1, backups)
+        self.what = what
+        self._fd = None
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        try:
+            with self._lock:
+                if self._fd is None or self._writes % self.CHECK_EVERY == 0:
+                    self._check()
+                os.write(self._fd, line)
+                self._writes += 1
+        except OSError as e:
+            print(f"Failed to write {self.what}: {e}")
+
+    def _check(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return self._reopen()
+        if self._fd is None or stat.st_ino != os.fstat(self._fd).st_ino:
+            # First write, or another process rotated the file
+            return self._reopen()
+        if self.max_bytes and stat.st_size >= self.max_bytes:
+            for n in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{n}"):
+                    os.replace(f"{self.path}.{n}", f"{self.path}.{n + 1}")
+            os.replace(self.path, self.path + ".1")
+            self._reopen()
+
+    def _reopen(self):
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+
+def read_jsonl(path, backups=1):
+    """Records of the rotated files, oldest first, then of the current one."""
+    names = [f"{path}.{n}" for n in range(backups, 0, -1)] + [path]
+    for name in names:
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash
+                    continue
@@ -1,21 +1,229 @@
 # app/utils/mail_sender.py
+import os
+import time
+import queue
+import smtplib
 import threading
-from flask import render_template
+
+from collections import deque
+from concurrent.futures import Future
 from flask_mailman import EmailMessage
 
-def send_async_email(app, msg):
-    with app.app_context():
-        msg.send()
+from app.utils.email_templates import render_email
+from app.utils import tracing
+from app.utils.metrics import call_site, site, timed
+
+_mail_worker = None
+_lock = threading.Lock()
+
+
+class RateLimiter:
+    """Spaces calls at least 1/per_second apart across threads, 0 disables."""
+
+    def __init__(self, per_second):
+        self.interval = 1 / per_second if per_second > 0 else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class MailWorker:
+    """
+    Sends queued emails from a fixed number of threads, each keeping one
+    authenticated SMTP connection open across messages instead of a new
+    thread and TLS handshake per email. A connection idle for idle_timeout
+    seconds is closed, SMTP servers drop them anyway.
+
+    Failed sends are retried with exponential backoff on a fresh
+    connection. submit() returns a Future that resolves once the message
+    is sent, or with the last error.
+    """
+
+    def __init__(
+        self,
+        app,
+        workers=2,
+        queue_size=500,
+        rate_limit=2.0,
+        max_attempts=3,
+        backoff=2.0,
+        idle_timeout=60.0,
+    ):
+        self.app = app
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self._queue = queue.Queue(queue_size)
+        self._rate = RateLimiter(rate_limit)
+        self._started = False
+        self._lock = threading.Lock()
+
+        self._sent = 0
+        self._failed = 0
+        self._retries = 0
+        self._connections = 0
+        # (seconds waiting in the queue, seconds talking to the server)
+        self._latencies = deque(maxlen=500)
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            for i in range(self.workers):
+                threading.Thread(
+                    target=self._run, name=f"mail-worker-{i}", daemon=True
+                ).start()
+            self._started = True
+
+    def submit(self, msg, timeout=30):
+        """Queues msg, raises queue.Full if the queue stays full for `timeout`."""
+        self.start()
+        future = Future()
+        # The send is labelled and traced as part of whatever queued it
+        item = (msg, future, time.monotonic(), call_site.get(), tracing.current())
+        self._queue.put(item, timeout=timeout)
+        return future
+
+    def _run(self):
+        from app import mail
+
+        connection = None
+        with self.app.app_context():
+            while True:
+                try:
+                    msg, future, queued_at, sender, parent = self._queue.get(
+                        timeout=self.idle_timeout
+                    )
+                except queue.Empty:
+                    connection = self._close(connection)
+                    continue
+
+                try:
+                    with site(sender), tracing.resume(parent):
+                        connection = self._deliver(mail, connection, msg, future, queued_at)
+                except Exception as e:
+                    # Anything unexpected fails this message only, the thread
+                    # has to live on or the queue stalls
+                    connection = self._close(connection)
+                    if not future.done():
+                        self._give_up(msg, future, e)
+
+    def _deliver(self, mail, connection, msg, future, queued_at):
+        """Sends msg with retries, returns the connection to use for the next one."""
+        waited = time.monotonic() - queued_at
+        tracing.record("smtp", "queue", time.time() - waited, waited)
+
+        for attempt in range(1, self.max_attempts + 1):
+            self._rate.wait()
+            started = time.monotonic()
+            try:
+                if connection is None:
+                    with timed("smtp", "connect"):
+                        connection = mail.get_connection()
+                        connection.open()
+                    self._connections += 1
+                with timed("smtp", "send"):
+                    if not connection.send_messages([msg]):
+                        raise ValueError(f"Nothing sent to {msg.to}")
+            except smtplib.SMTPRecipientsRefused as e:
+                # Retrying won't make the address valid
+                self._give_up(msg, future, e)
+                break
+            except (smtplib.SMTPException, OSError, ValueError) as e:
+                connection = self._close(connection)
+                if attempt == self.max_attempts:
+                    self._give_up(msg, future, e)
+                    break
+                delay = self.backoff * 2 ** (attempt - 1)
+                print(f"Sending to {msg.to} failed ({e}), retrying in {delay:g}s")
+                self._retries += 1
+                time.sleep(delay)
+            else:
+                finished = time.monotonic()
+                self._latencies.append((started - queued_at, finished - started))
+                self._sent += 1
+                future.set_result(True)
+                break
+        return connection
+
+    def _give_up(self, msg, future, error):
+        print(f"Failed to send email to {msg.to}: {error}")
+        self._failed += 1
+        future.set_exception(error)
+
+    @staticmethod
+    def _close(connection):
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        return None
+
+    def stats(self):
+        """Queue depth, counters and latencies (seconds) of recent sends."""
+        latencies = list(self._latencies)
+        waits = sorted(wait for wait, _ in latencies)
+        sends = sorted(send for _, send in latencies)
+
+        def p95(values):
+            return values[int(len(values) * 0.95)] if values else 0.0
+
+        return {
+            "queue_depth": self._queue.qsize(),
+            "sent": self._sent,
+            "failed": self._failed,
+            "retries": self._retries,
+            "connections_opened": self._connections,
+            "queue_wait_avg": sum(waits) / len(waits) if waits else 0.0,
+            "queue_wait_p95": p95(waits),
+            "send_avg": sum(sends) / len(sends) if sends else 0.0,
+            "send_p95": p95(sends),
+        }
+
+
+def get_mail_worker():
+    global _mail_worker
+    if _mail_worker is None:
+        with _lock:
+            if _mail_worker is None:
+                from app import app
+
+                _mail_worker = MailWorker(
+                    app,
+                    workers=int(os.getenv("MAIL_WORKERS", 2)),
+                    queue_size=int(os.getenv("MAIL_QUEUE_SIZE", 500)),
+                    rate_limit=float(os.getenv("MAIL_RATE_LIMIT", 2)),
+                    max_attempts=int(os.getenv("MAIL_MAX_ATTEMPTS", 3)),
+                    backoff=float(os.getenv("MAIL_RETRY_BACKOFF", 2)),
+                    idle_timeout=float(os.getenv("MAIL_IDLE_TIMEOUT", 60)),
+                )
+    return _mail_worker
+
 
 def send_email(subject, recipient, template, **kwargs):
+    """
+    Renders the template and queues the email on the mail worker.
+    Returns a Future, call .result() to wait until it's actually sent.
+    """
     from app import app
+    body = render_email(template, **kwargs)
     with app.app_context():
         msg = EmailMessage(
             subject=subject,
-            body=render_template(template, **kwargs),
+            body=body,
             from_email=app.config["MAIL_DEFAULT_SENDER"],
             to=[recipient]
         )
         msg.content_subtype = 'html'
-        thread = threading.Thread(target=send_async_email, args=(app, msg))
-        thread.start()
+    return get_mail_worker().submit(msg)
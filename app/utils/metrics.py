@@ -0,0 +1,210 @@
+# app/utils/metrics.py
+import os
+import time
+import bisect
+import threading
+import contextvars
+
+from contextlib import contextmanager
+
+from app.utils import tracing
+
+# Latency buckets in seconds, from a cache-warm backend call to a slow SMTP send
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Who is making the outbound call, e.g. "views.accept" or
+# "new_application.discord". Context variables follow asyncio tasks and
+# run_coroutine_threadsafe; executors need contextvars.copy_context().
+call_site = contextvars.ContextVar("call_site", default="unknown")
+
+_registry = None
+_lock = threading.Lock()
+
+
+class _Series:
+    __slots__ = ("buckets", "sum", "count", "errors")
+
+    def __init__(self, size):
+        self.buckets = [0] * size
+        self.sum = 0.0
+        self.count = 0
+        self.errors = 0
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Registry:
+    """
+    Latency histograms and error counters for outbound calls, labelled by
+    kind (backend, shortlink, smtp, image, discord, job_stage, http), op
+    (endpoint or operation) and call site. Exported in the Prometheus text
+    format by render().
+
+    Numbers are per process: with ROLE=web the bot process exports its own
+    on BOT_METRICS_PORT.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._series = {}
+        self._gauges = []
+        self._lock = threading.Lock()
+
+    def observe(self, kind, op, seconds, ok=True, site=None):
+        key = (kind, op, site or call_site.get())
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(len(self.buckets) + 1)
+            series.buckets[index] += 1
+            series.sum += seconds
+            series.count += 1
+            if not ok:
+                series.errors += 1
+
+    def counts(self):
+        """{(kind, op): number of calls}, summed over call sites."""
+        counts = {}
+        with self._lock:
+            for (kind, op, _), series in self._series.items():
+                counts[kind, op] = counts.get((kind, op), 0) + series.count
+        return counts
+
+    def add_gauges(self, func):
+        """func() returns {(name, help): {labels tuple or (): value}}, read on every scrape."""
+        self._gauges.append(func)
+
+    def render(self):
+        with self._lock:
+            snapshot = [
+                (key, list(s.buckets), s.sum, s.count, s.errors)
+                for key, s in self._series.items()
+            ]
+        snapshot.sort()
+
+        lines = [
+            "# HELP hackit_call_duration_seconds Latency of outbound calls and stages.",
+            "# TYPE hackit_call_duration_seconds histogram",
+        ]
+        for (kind, op, site), buckets, total, count, _ in snapshot:
+            labels = f'kind="{_escape(kind)}",op="{_escape(op)}",site="{_escape(site)}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), buckets):
+                cumulative += n
+                lines.append(
+                    f'hackit_call_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f"hackit_call_duration_seconds_sum{{{labels}}} {total}")
+            lines.append(f"hackit_call_duration_seconds_count{{{labels}}} {count}")
+
+        lines += [
+            "# HELP hackit_call_errors_total Outbound calls and stages that failed.",
+            "# TYPE hackit_call_errors_total counter",
+        ]
+        for (kind, op, site), _, _, _, errors in snapshot:
+            lines.append(
+                f'hackit_call_errors_total{{kind="{_escape(kind)}",op="{_escape(op)}",'
+                f'site="{_escape(site)}"}} {errors}'
+            )
+
+        for func in self._gauges:
+            try:
+                gauges = func()
+            except Exception as e:
+                print(f"Metrics gauge failed: {e}")
+                continue
+            for (name, help_text), values in gauges.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} gauge")
+                for labels, value in values.items():
+                    label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                    lines.append(f"{name}{{{label_text}}} {value}" if labels else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _lock:
+            if _registry is None:
+                _registry = Registry()
+    return _registry
+
+
+class timed:
+    """
+    Times the block into the registry, counting an exception as an error,
+    and as a span of the current trace. Set .ok = False on the object `as`
+    gives for failures that don't raise.
+
+    A class rather than @contextmanager, it wraps every outbound call and
+    the generator machinery costs more than the timing itself.
+    """
+
+    __slots__ = ("kind", "op", "span")
+
+    def __init__(self, kind, op):
+        self.kind = kind
+        self.op = op
+
+    def __enter__(self):
+        self.span = tracing.begin(self.kind, self.op)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self.span
+        if exc_type is not None:
+            span.ok = False
+        get_registry().observe(
+            self.kind, self.op, time.perf_counter() - span.started, span.ok
+        )
+        tracing.finish(span)
+
+
+@contextmanager
+def site(name):
+    """Labels the outbound calls made inside the block with `name`."""
+    token = call_site.set(name)
+    try:
+        yield
+    finally:
+        call_site.reset(token)
+
+
+def instrument_discord(bot):
+    """Times every Discord REST call, op being the route, e.g. "POST /channels/{channel_id}/messages"."""
+    request = bot.http.request
+
+    async def timed_request(route, **kwargs):
+        with timed("discord", f"{route.method} {route.path}"):
+            return await request(route, **kwargs)
+
+    bot.http.request = timed_request
+
+
+def serve_metrics(port):
+    """Serves /metrics from a background thread, for processes without Flask."""
+    from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+    def app(environ, start_response):
+        if environ.get("PATH_INFO") != "/metrics":
+            start_response("404 Not Found", [("Content-Type", "text/plain")])
+            return [b"Not found"]
+        body = get_registry().render().encode("utf-8")
+        start_response("200 OK", [("Content-Type", CONTENT_TYPE)])
+        return [body]
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = make_server(
+        os.getenv("METRICS_HOST", "127.0.0.1"), port, app, handler_class=QuietHandler
+    )
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,55 @@
+# app/utils/multipart.py
+import json
+import uuid
+
+CHUNK_SIZE = 64 * 1024
+
+
+class MultipartBody:
+    """
+    A multipart/form-data body that requests can stream.
+
+    It has a length, so requests sends a Content-Length instead of chunked
+    encoding (which some servers refuse), and it iterates in chunks so the
+    parts are never joined into one big bytes object.
+    """
+
+    def __init__(self):
+        self.boundary = uuid.uuid4().hex
+        self._parts = []
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def add_json(self, name, value):
+        self.add(name, json.dumps(value).encode("utf-8"), "application/json")
+
+    def add(self, name, data, content_type="application/octet-stream", filename=None):
+        disposition = f'form-data; name="{name}"'
+        if filename:
+            disposition += f'; filename="{filename}"'
+        header = (
+            f"--{self.boundary}\r\n"
+            f"Content-Disposition: {disposition}\r\n"
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode("utf-8")
+        self._parts.append((header, data))
+
+    def _closing(self):
+        return f"--{self.boundary}--\r\n".encode("utf-8")
+
+    def __len__(self):
+        return (
+            sum(len(header) + len(data) + 2 for header, data in self._parts)
+            + len(self._closing())
+        )
+
+    def __iter__(self):
+        for header, data in self._parts:
+            yield header
+            view = memoryview(data)
+            for start in range(0, len(view), CHUNK_SIZE):
+                yield view[start : start + CHUNK_SIZE]
+            yield b"\r\n"
+        yield self._closing()
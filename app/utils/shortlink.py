@@ -1,11 +1,36 @@
 # app/utils/shortlink.py
 import os
+import asyncio
 import requests
+import contextvars
 
+from app.utils.metrics import timed
 from datetime import datetime, timedelta
 
 
-async def make_short_link(url, expiry_days):
+def _timeout():
+    """(connect, read) timeout tuple for the shortener."""
+    return (
+        float(os.getenv("SHORTEN_CONNECT_TIMEOUT", 3)),
+        float(os.getenv("SHORTEN_READ_TIMEOUT", 10)),
+    )
+
+
+def _shorten(headers, payload):
+    # A timeout raises, the outbox stage calling this retries it
+    with timed("shortlink", "/shorten") as call:
+        response = requests.post(
+            os.getenv("SHORTEN_API_URL")+"/shorten",
+            headers=headers,
+            json=payload,
+            timeout=_timeout(),
+        )
+        call.ok = response.status_code == 200
+    return response
+
+
+def short_link(url, expiry_days):
+    """Blocking, for worker threads. Coroutines await make_short_link instead."""
     if expiry_days == 0 or None:
         expiration_timestamp = None
     else:
@@ -21,11 +46,15 @@ async def make_short_link(url, expiry_days):
     else:
         payload = {"long_url": url}
 
-    response = requests.post(
-        os.getenv("SHORTEN_API_URL")+"/shorten", headers=headers, json=payload
-    )
-
+    response = _shorten(headers, payload)
     if response.status_code != 200:
         return None
 
     return f"{os.getenv("SHORTEN_API_URL")}/{response.json()["short_url"]}"
+
+
+async def make_short_link(url, expiry_days):
+    # In a thread, a blocking request here would stall the bot's event loop
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(None, context.run, short_link, url, expiry_days)
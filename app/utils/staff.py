@@ -0,0 +1,134 @@
+# app/utils/staff.py
+
+# Fields holding base64 images, these are big and only needed when someone
+# actually looks at the ID cards.
+HEAVY_FIELDS = ("student_card", "id_card")
+
+# What a permission check needs, pass as get_staff(..., fields=PERMISSION_FIELDS)
+PERMISSION_FIELDS = ("uuid", "discord_id", "permission_level", "team_leader")
+
+# Everything except the images, for embeds and the applicant data page.
+PROFILE_FIELDS = (
+    "uuid",
+    "real_name",
+    "nickname",
+    "email",
+    "official_email",
+    "phone_number",
+    "high_school_stage",
+    "city",
+    "school",
+    "national_id",
+    "introduction",
+    "relevant_experience",
+    "choicereason",
+    "signature_url",
+    "interested_fields",
+    "interested_fields2",
+    "emergency_contact",
+    "current_group",
+    "permission_level",
+    "team_leader",
+    "discord_id",
+    "apply_message",
+    "created_at",
+)
+
+
+class Staff:
+    """
+    A staff record parsed once from the backend response.
+
+    Records fetched with a field projection only carry those fields, the
+    heavy image fields are fetched from the backend on first access.
+    Unknown fields the backend sends are kept in `extra`.
+    """
+
+    __slots__ = PROFILE_FIELDS + ("fields", "extra", "_student_card", "_id_card")
+
+    def __init__(self, data, fields=None):
+        self.fields = frozenset(fields) if fields else None
+        self.extra = {}
+        for name in PROFILE_FIELDS:
+            setattr(self, name, None)
+        self._student_card = self._id_card = None
+
+        for key, value in data.items():
+            # The backend may not support projections, drop what wasn't asked for.
+            if self.fields is not None and key not in self.fields:
+                continue
+            if key == "student_card":
+                self._student_card = value
+            elif key == "id_card":
+                self._id_card = value
+            elif key in PROFILE_FIELDS:
+                setattr(self, key, value)
+            else:
+                self.extra[key] = value
+
+        if self.permission_level is not None:
+            self.permission_level = int(self.permission_level)
+        if self.discord_id is not None:
+            self.discord_id = str(self.discord_id)
+        if self.team_leader is not None:
+            self.team_leader = str(self.team_leader)
+
+    @classmethod
+    def from_response(cls, body, fields=None):
+        """Parses the getstaffs response body into a list of records."""
+        return [cls(data, fields) for data in (body or {}).get("data") or []]
+
+    def has(self, field):
+        return self.fields is None or field in self.fields
+
+    def covers(self, fields):
+        """Whether this record can answer a lookup for `fields`."""
+        if self.fields is None:
+            return True
+        return fields is not None and self.fields.issuperset(fields)
+
+    @property
+    def student_card(self):
+        if self._student_card is None and not self.has("student_card"):
+            self._load_heavy()
+        return self._student_card
+
+    @property
+    def id_card(self):
+        if self._id_card is None and not self.has("id_card"):
+            self._load_heavy()
+        return self._id_card
+
+    def _load_heavy(self):
+        # Blocking, only the Flask routes look at the images.
+        from app.utils.db import get_staff
+
+        is_valid, records = get_staff(
+            {"uuid": self.uuid}, fields=("uuid",) + HEAVY_FIELDS
+        )
+        if is_valid and records:
+            self._student_card = records[0]._student_card
+            self._id_card = records[0]._id_card
+            self.fields = self.fields.union(HEAVY_FIELDS)
+
+    def get(self, key, default=None):
+        """dict-style access, so helpers can take a Staff or a form dict."""
+        if key in PROFILE_FIELDS or key in HEAVY_FIELDS:
+            value = getattr(self, key)
+            return default if value is None else value
+        return self.extra.get(key, default)
+
+    def __getattr__(self, name):
+        # Only called for names that aren't slots.
+        try:
+            return object.__getattribute__(self, "extra")[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def to_dict(self):
+        data = {name: getattr(self, name) for name in PROFILE_FIELDS}
+        data.update(self.extra)
+        return data
+
+    def __repr__(self):
+        return f"<Staff {self.uuid} {self.real_name!r}>"
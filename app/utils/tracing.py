@@ -0,0 +1,205 @@
+# app/utils/tracing.py
+import os
+import time
+import random
+import itertools
+import threading
+import contextvars
+
+from contextlib import contextmanager
+
+from app.utils.jsonl import JsonlSink, read_jsonl
+
+# The applicant uuid everything done for one application is filed under.
+# Like metrics.call_site it follows asyncio tasks and
+# run_coroutine_threadsafe, threads need contextvars.copy_context() or
+# current()/resume().
+trace_id = contextvars.ContextVar("trace_id", default=None)
+_current = contextvars.ContextVar("span", default=None)
+
+# Span ids are a counter, written out behind a prefix unique to the process
+_ids = itertools.count(1)
+_prefix = f"{random.getrandbits(32):08x}"
+
+_sink = None
+_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("name", "op", "id", "parent", "start", "started", "ok", "_token")
+
+    def __init__(self, name, op):
+        self.name = name
+        self.op = op
+        self.id = next(_ids)
+        self.parent = _current.get()
+        self.start = time.time()
+        self.started = time.perf_counter()
+        self.ok = True
+        self._token = _current.set(self.id)
+
+
+def begin(name, op=None):
+    """Opens a span, nested in the current one. finish() it in the same context."""
+    return Span(name, op)
+
+
+def finish(span):
+    _current.reset(span._token)
+    trace = trace_id.get()
+    if trace is None:
+        return
+    sink = get_trace_sink()
+    if sink is None:
+        return
+    from app.utils.metrics import call_site
+
+    sink.write(
+        {
+            "trace": trace,
+            "span": f"{_prefix}{span.id:x}",
+            "parent": f"{_prefix}{span.parent:x}" if span.parent else None,
+            "name": span.name,
+            "op": span.op,
+            "site": call_site.get(),
+            "start": span.start,
+            "duration": time.perf_counter() - span.started,
+            "ok": span.ok,
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+        }
+    )
+
+
+@contextmanager
+def span(name, op=None):
+    """Times the block as a span of the current trace, if there is one."""
+    current = begin(name, op)
+    try:
+        yield current
+    except BaseException:
+        current.ok = False
+        raise
+    finally:
+        finish(current)
+
+
+def record(name, op, start, duration, ok=True):
+    """Writes a span that already happened, e.g. time spent waiting in a queue."""
+    current = begin(name, op)
+    current.start = start
+    current.started = time.perf_counter() - duration
+    current.ok = ok
+    finish(current)
+
+
+def current():
+    """(trace, span) to resume() on another thread."""
+    return trace_id.get(), _current.get()
+
+
+@contextmanager
+def resume(state):
+    """Spans of the block nest under those of whoever called current()."""
+    trace, parent = state
+    trace_token = trace_id.set(trace)
+    span_token = _current.set(parent)
+    try:
+        yield
+    finally:
+        _current.reset(span_token)
+        trace_id.reset(trace_token)
+
+
+def trace(uuid):
+    """Files the spans of the block under `uuid`, for threads that run many applications."""
+    return resume((uuid, None))
+
+
+def reset():
+    """Forgets the trace and span of the previous request handled by this thread."""
+    trace_id.set(None)
+    _current.set(None)
+
+
+def get_trace_sink():
+    """None unless TRACE_PATH is set, tracing is off then."""
+    global _sink
+    if _sink is None:
+        path = os.getenv("TRACE_PATH", "")
+        if not path:
+            return None
+        with _lock:
+            if _sink is None:
+                _sink = JsonlSink(
+                    path,
+                    int(os.getenv("TRACE_MAX_BYTES", 50 * 1024 * 1024)),
+                    what="trace span",
+                )
+    return _sink
+
+
+# -- reading them back, used by the trace CLI --
+
+
+def read_spans(path, uuid=None):
+    """Spans from the rotated file then the current one, optionally of one applicant."""
+    return [span for span in read_jsonl(path) if uuid is None or span["trace"] == uuid]
+
+
+def episodes(spans, gap):
+    """
+    Splits one applicant's spans wherever nothing happened for `gap`
+    seconds, so the first form, the second form and the review, days
+    apart, are looked at separately.
+    """
+    spans = sorted(spans, key=lambda s: s["start"])
+    groups = []
+    end = None
+    for span in spans:
+        if end is None or span["start"] - end > gap:
+            groups.append([])
+            end = span["start"]
+        groups[-1].append(span)
+        end = max(end, span["start"] + span["duration"])
+    return groups
+
+
+def _end(span):
+    return span["start"] + span["duration"]
+
+
+def critical_path(spans):
+    """
+    [(span or None, seconds)] in time order: the chain of work the
+    episode's end was waiting on, walking back from the last span to end
+    through whichever child finished last. None is time nothing was
+    running, e.g. a job waiting in the outbox.
+    """
+    ids = {span["span"] for span in spans}
+    children = {}
+    for span in spans:
+        parent = span["parent"] if span["parent"] in ids else None
+        children.setdefault(parent, []).append(span)
+
+    def walk(span, start, end):
+        segments = []
+        cursor = end
+        key = span["span"] if span else None
+        for child in sorted(children.get(key, []), key=_end, reverse=True):
+            # Clamped, a child can't outlast its parent on the path
+            child_start = max(child["start"], start)
+            if child_start >= cursor:
+                continue
+            child_end = min(_end(child), cursor)
+            if cursor > child_end:
+                segments.append((span, cursor - child_end))
+            segments += walk(child, child_start, child_end)
+            cursor = child_start
+        if cursor > start:
+            segments.append((span, cursor - start))
+        return segments
+
+    start = min(span["start"] for span in spans)
+    end = max(_end(span) for span in spans)
+    return list(reversed(walk(None, start, end)))
@@ -0,0 +1,98 @@
+# asgi.py
+"""
+ASGI entry point: the web app and the Discord bot share one event loop
+under uvicorn, instead of the bot thread and Flask dev server of run.py.
+
+    python asgi.py
+    uvicorn asgi:app --host 0.0.0.0 --port 80
+
+Run a single worker, every worker would log the bot in again. To scale the
+web side, split it from the bot: the web workers only write jobs to the
+outbox, and one bot.py process runs them (set the same OUTBOX_PATH and
+OUTBOX_SOCKET for both).
+
+    ROLE=web WEB_WORKERS=4 python asgi.py
+    python bot.py
+"""
+import os
+import asyncio
+
+import discord
+from a2wsgi import WSGIMiddleware
+from dotenv import load_dotenv
+
+from app import create_app
+
+# create_app() loads it too, ROLE and WEB_WORKERS are needed before that
+load_dotenv()
+
+
+def _role():
+    return os.getenv("ROLE", "all").lower()
+
+
+def _workers():
+    return int(os.getenv("WEB_WORKERS", 1)) if _role() == "web" else 1
+
+
+# The app is built once per process:
+# - `python asgi.py` with one worker builds it here and hands uvicorn the
+#   object, with several each worker imports asgi and builds its own.
+# - The image normalizing workers (app.utils.image) are spawned and import
+#   this file again as __mp_main__. They only need app.utils.image, not a
+#   second app with its outbox, mail workers and metrics hooks.
+if __name__ != "__mp_main__" and not (__name__ == "__main__" and _workers() > 1):
+    flask_app = create_app()
+
+    # The Flask views are sync, they run on this pool while the loop keeps
+    # serving the bot and other requests.
+    web = WSGIMiddleware(flask_app, workers=int(os.getenv("WEB_THREADS", 10)))
+
+
+def _bot_stopped(task):
+    if not task.cancelled() and task.exception():
+        print(f"Discord bot stopped: {task.exception()!r}")
+
+
+async def lifespan(receive, send):
+    bot_task = None
+    bot = None
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup" and _role() == "web":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.startup":
+            from app.discord.bot_module import bot
+
+            # bot.run() would do this for us
+            discord.utils.setup_logging()
+            bot_task = asyncio.create_task(bot.start(os.getenv("DISCORD_TOKEN")))
+            bot_task.add_done_callback(_bot_stopped)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if bot and not bot.is_closed():
+                await bot.close()
+            if bot_task:
+                await asyncio.gather(bot_task, return_exceptions=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+    else:
+        await web(scope, receive, send)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    workers = _workers()
+    uvicorn.run(
+        # Importing "asgi:app" here would build the app a second time
+        app if workers == 1 else "asgi:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", 80)),
+        workers=workers,
+    )
@@ -0,0 +1,22 @@
+# bot.py
+"""
+Runs only the Discord bot, which also drains the outbox. Pair it with
+ROLE=web python asgi.py, see asgi.py.
+"""
+import os
+
+from app import create_app
+from app.discord.bot_module import bot
+from app.utils.metrics import serve_metrics
+
+# Email templates are rendered in this process, they need the app config.
+# The outbox normalizes ID images here too, in spawned workers that import
+# this file again as __mp_main__, see asgi.py.
+if __name__ != "__mp_main__":
+    app = create_app()
+
+if __name__ == "__main__":
+    # The web process's /metrics can't see this one, serve our own
+    if os.getenv("BOT_METRICS_PORT"):
+        serve_metrics(int(os.getenv("BOT_METRICS_PORT")))
+    bot.run(os.getenv("DISCORD_TOKEN"))
@@ -4,7 +4,9 @@ from app.discord.bot_module import bot
 from app import create_app
 import os
 
-app = create_app()
+# Spawned image workers import this file again as __mp_main__, see asgi.py
+if __name__ != "__mp_main__":
+    app = create_app()
 
 
 def run_discord_bot():
@@ -12,6 +14,7 @@ def run_discord_bot():
 
 
 # Bad idea, should've used quart or something much more elegant.
+# For production use asgi.py, which runs both on one event loop.
 if __name__ == "__main__":
     # if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
         # bot_thread = threading.Thread(target=run_discord_bot)
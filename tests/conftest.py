@@ -0,0 +1,31 @@
+# tests/conftest.py
+import tempfile
+
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def client():
+    """
+    Test client of the app, talking to tools.stub_backend. Configured like
+    tools.loadtest, the outbox isn't started so jobs stay queued.
+    """
+    from tools import stub_backend, stub_services
+    from tools.loadtest import configure, serve_wsgi
+
+    backend_url = serve_wsgi(stub_backend.app)
+    files_url = serve_wsgi(stub_services.files)
+    # Nothing is sent, the outbox that would send it isn't running
+    configure(
+        SimpleNamespace(mail_rate_limit=0),
+        tempfile.mkdtemp(prefix="tests-"),
+        backend_url,
+        files_url,
+        smtp_port=1,
+    )
+
+    from app import create_app
+
+    return create_app().test_client()
@@ -0,0 +1,38 @@
+# tests/test_idempotency.py
+from tools import stub_backend
+from tools.loadtest import first_part_body
+
+
+def test_redelivered_submission_is_replayed(client):
+    from app.utils.jobs import get_job_queue
+
+    body = first_part_body(0)
+    queued = sum(get_job_queue().counts().values())
+
+    first = client.post("/apply/first_part_application", json=body)
+    second = client.post("/apply/first_part_application", json=body)
+
+    assert first.status_code == 202
+    assert "Idempotent-Replay" not in first.headers
+    assert second.status_code == 202
+    assert second.headers["Idempotent-Replay"] == "true"
+    assert second.get_json() == first.get_json()
+
+    # One staff record and one job, the replay created nothing
+    created = [
+        record
+        for record in stub_backend.staff.values()
+        if record["email"] == "applicant0@loadtest.invalid"
+    ]
+    assert len(created) == 1
+    assert sum(get_job_queue().counts().values()) == queued + 1
+
+
+def test_new_submission_id_is_processed(client):
+    first = client.post("/apply/first_part_application", json=first_part_body(1))
+    body = dict(first_part_body(1), submissionId="loadtest-1-1-again")
+    second = client.post("/apply/first_part_application", json=body)
+
+    assert second.status_code == 202
+    assert "Idempotent-Replay" not in second.headers
+    assert second.get_json()["job_id"] != first.get_json()["job_id"]
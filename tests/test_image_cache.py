@@ -0,0 +1,57 @@
+# tests/test_image_cache.py
+import os
+import time
+
+from app.utils.image_cache import ImageCache, sha256
+
+
+def image(data):
+    return {"data": data, "mime_type": "image/jpeg", "original_bytes": len(data) * 2}
+
+
+def put(cache, name):
+    data = f"jpeg {name}".encode()
+    blob = cache.put(f"https://files.invalid/{name}.jpg", sha256(data * 2), "v1", image(data))
+    return blob, {"id_card": {"front": {"sha256": blob}}}
+
+
+def test_expired_blob_is_pruned_with_its_rows(tmp_path):
+    cache = ImageCache(str(tmp_path), ttl=0.2)
+    old, old_images = put(cache, "old")
+    cache.mark_uploaded("applicant-1", old_images)
+    assert cache.get_url("https://files.invalid/old.jpg", "v1")["sha256"] == old
+    assert cache.unchanged("applicant-1", old_images) == ["id_card"]
+
+    time.sleep(0.3)
+    # Storing anything prunes what expired meanwhile
+    new, _ = put(cache, "new")
+
+    assert cache.get_url("https://files.invalid/old.jpg", "v1") is None
+    assert not os.path.exists(cache._blob_path(old))
+    # The backend's copy may still be the old one, but we can't prove it anymore
+    assert cache.unchanged("applicant-1", old_images) == []
+    assert cache.get_url("https://files.invalid/new.jpg", "v1")["sha256"] == new
+    assert cache.stats()["blobs"] == 1
+
+
+def test_blobs_expired_while_stopped_are_pruned_on_open(tmp_path):
+    cache = ImageCache(str(tmp_path), ttl=3600)
+    blob, _ = put(cache, "old")
+    time.sleep(0.1)
+
+    reopened = ImageCache(str(tmp_path), ttl=0.05)
+
+    assert reopened.stats()["blobs"] == 0
+    assert not os.path.exists(reopened._blob_path(blob))
+
+
+def test_recently_used_blob_is_kept(tmp_path):
+    cache = ImageCache(str(tmp_path), ttl=0.4)
+    blob, _ = put(cache, "used")
+    time.sleep(0.25)
+    # A hit refreshes last_used
+    assert cache.get_url("https://files.invalid/used.jpg", "v1")["sha256"] == blob
+    time.sleep(0.25)
+    put(cache, "other")
+
+    assert cache.get_url("https://files.invalid/used.jpg", "v1")["sha256"] == blob
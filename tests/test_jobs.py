@@ -0,0 +1,105 @@
+# tests/test_jobs.py
+import time
+import threading
+
+import pytest
+
+from app.utils.jobs import JobQueue
+
+
+def wait_for(queue, job_id, status, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.02)
+    pytest.fail(f"Job {job_id} still {queue.get(job_id)['status']}, expected {status}")
+
+
+def make_queue(tmp_path, poll_interval=0.05, **kwargs):
+    return JobQueue(path=str(tmp_path / "outbox.db"), poll_interval=poll_interval, **kwargs)
+
+
+def test_crashed_job_resumes_at_its_stage(tmp_path):
+    calls = []
+
+    def first(data, state):
+        calls.append("first")
+        return {"link": "https://example.invalid/1"}
+
+    def crash(data, state):
+        # The process dies mid-stage, the job stays marked running
+        raise SystemExit
+
+    def second(data, state):
+        calls.append(("second", state["link"]))
+
+    # Polls too seldom to claim the job again once it's replayed below
+    queue = make_queue(tmp_path, poll_interval=60)
+    queue.register("kind", [("first", first), ("second", crash)])
+    job_id = queue.submit("kind", {})
+    queue.start()
+    deadline = time.monotonic() + 10
+    while queue.get(job_id)["stage"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert queue.get(job_id)["status"] == "running"
+
+    # The restarted process sees the same outbox
+    restarted = make_queue(tmp_path)
+    restarted.register("kind", [("first", first), ("second", second)])
+    restarted.start()
+    job = wait_for(restarted, job_id, "done")
+
+    assert calls == ["first", ("second", "https://example.invalid/1")]
+    assert job["state"] == {"link": "https://example.invalid/1"}
+
+
+def test_failed_job_is_retried_by_id(tmp_path):
+    broken = threading.Event()
+    broken.set()
+    calls = []
+
+    def stage(data, state):
+        calls.append(data["n"])
+        if broken.is_set():
+            raise RuntimeError("backend down")
+
+    queue = make_queue(tmp_path, max_attempts=2, backoff=0.01)
+    queue.register("kind", [("stage", stage)])
+    job_id = queue.submit("kind", {"n": 1})
+    queue.start()
+    job = wait_for(queue, job_id, "failed")
+    assert job["attempts"] == 2
+    assert job["last_error"] == "stage: backend down"
+
+    broken.clear()
+    assert queue.retry(job_id) == 1
+    wait_for(queue, job_id, "done")
+    assert calls == [1, 1, 1]
+    # Done jobs aren't run again
+    assert queue.retry(job_id) == 0
+
+
+def test_running_job_is_not_retried(tmp_path):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def stage(data, state):
+        calls.append(1)
+        started.set()
+        release.wait(10)
+
+    queue = make_queue(tmp_path)
+    queue.register("kind", [("stage", stage)])
+    job_id = queue.submit("kind", {})
+    queue.start()
+    assert started.wait(10)
+
+    assert queue.retry(job_id) == 0
+    assert queue.get(job_id)["status"] == "running"
+
+    release.set()
+    wait_for(queue, job_id, "done")
+    assert calls == [1]
@@ -0,0 +1,212 @@
+# tools/bench_form_schema.py
+"""
+Micro-benchmark: per-submission cost of parsing the first and second part
+forms with the old if/elif chains versus the precompiled FormSchema.
+
+    python -m tools.bench_form_schema [--number 20000]
+
+Field ids are made up here, the real ones come from the .env file.
+"""
+import os
+import argparse
+import timeit
+
+FIRST_PART = [
+    "NAME", "EMAIL", "PHONE", "HIGH_SCHOOL_STAGE", "CITY", "TOP_INTERSTED_FIELD",
+    "OTHER_INTERESTED_FIELDS", "INTRODUCTION", "CHOICEREASON",
+    "RELATEDEXPERIENCE", "SIGNATUREURL",
+]
+SECOND_PART = [
+    "NICKNAME", "OFFICIAL_EMAIL", "SCHOOL_NAME", "NATIONAL_ID", "INTERESTED_FIELD",
+    "EMERGENCY_CONTACT_NAME", "EMERGENCY_CONTACT_PHONE",
+    "EMERGENCY_CONTACT_RELATIONSHIP", "EMERGENCY_CONTACT_NAME2",
+    "EMERGENCY_CONTACT_PHONE2", "EMERGENCY_CONTACT_RELATIONSHIP2",
+    "STUDENT_ID_FRONT", "STUDENT_ID_BACK", "ID_CARD_FRONT", "ID_CARD_BACK",
+]
+
+for key in FIRST_PART:
+    os.environ.setdefault(f"FIELD_{key}", f"f1_{key.lower()}")
+for key in SECOND_PART:
+    os.environ.setdefault(f"FIELD_TWO_{key}", f"f2_{key.lower()}")
+for i in range(1, 9):
+    os.environ.setdefault(f"TOP_INTERESTED_FIELD_{i}", f"top_{i}")
+    os.environ.setdefault(f"OTHER_INTERESTED_FIELD_{i}", f"other_{i}")
+    os.environ.setdefault(f"TWO_INTERESTED_FIELD_{i}", f"two_{i}")
+for i in range(1, 5):
+    os.environ.setdefault(f"HIGH_SCHOOL_STAGE_{i}", f"stage_{i}")
+
+from app.routes import application  # noqa: E402  (needs the env above)
+
+
+def first_part_answers():
+    m = application.field_mapping
+    return [
+        {"id": m["Name"], "value": "王小明"},
+        {"id": m["Email"], "value": "applicant@example.com"},
+        {"id": m["Phone"], "value": "+886912345678"},
+        {"id": m["HighSchoolStage"], "value": {"value": ["stage_2"]}},
+        {"id": m["City"], "value": "台北市"},
+        {"id": m["TopInterestedField"], "value": {"value": ["top_5"]}},
+        {"id": m["OtherInterestedFields"], "value": {"value": ["other_1", "other_5"]}},
+        {"id": m["Introduction"], "value": "Hi " * 100},
+        {"id": m["ChoiceReason"], "value": "Because " * 50},
+        {"id": m["RelatedExperience"], "value": "Lots " * 50},
+        {"id": m["SignatureURL"], "value": "https://example.com/signature.png"},
+    ]
+
+
+def second_part_answers():
+    m = application.field_mapping_two
+    image = {"url": "https://example.com/image.jpg"}
+    return [
+        {"id": m["Nickname"], "value": "小明"},
+        {"id": m["OfficialEmail"], "value": "ming@hackit.tw"},
+        {"id": m["SchoolName"], "value": "建國中學"},
+        {"id": m["NationalID"], "value": "A123456789"},
+        {"id": m["InterestedFields2"], "value": {"value": ["two_5"]}},
+        {"id": m["EmergencyContactName"], "value": "王大明"},
+        {"id": m["EmergencyContactPhone"], "value": "+886922333444"},
+        {"id": m["EmergencyContactRelationship"], "value": "父"},
+        {"id": m["EmergencyContactName2"], "value": "陳美麗"},
+        {"id": m["EmergencyContactPhone2"], "value": "+886933444555"},
+        {"id": m["EmergencyContactRelationship2"], "value": "母"},
+        {"id": m["StudentIDFront"], "value": image},
+        {"id": m["StudentIDBack"], "value": image},
+        {"id": m["IDCardFront"], "value": image},
+        {"id": m["IDCardBack"], "value": image},
+    ]
+
+
+# The parsers as they were before FormSchema, kept only for comparison.
+
+
+def legacy_first_part(form_data):
+    field_mapping = application.field_mapping
+    name = email = phone_number = high_school_stage = city = introduction = choicereason = relevant_experience = signature_url = None
+    top_interested_field = other_interested_fields = []
+    for answer in form_data:
+        field_id = answer.get("id")
+        field_value = answer.get("value")
+        if field_id == field_mapping.get("Name"):
+            name = field_value
+        elif field_id == field_mapping.get("Email"):
+            email = field_value
+        elif field_id == field_mapping.get("Phone"):
+            phone_number = field_value
+        elif field_id == field_mapping.get("HighSchoolStage"):
+            if isinstance(field_value, dict):
+                stage_id = field_value.get("value", [None])[0]
+                high_school_stage = application.high_school_stage_mapping.get(
+                    stage_id, stage_id
+                )
+        elif field_id == field_mapping.get("City"):
+            city = field_value
+        elif field_id == field_mapping.get("TopInterestedField"):
+            ids = field_value.get("value", []) if isinstance(field_value, dict) else []
+            top_interested_field = [
+                application.top_interested_field_mapping.get(i, i) for i in ids
+            ]
+        elif field_id == field_mapping.get("OtherInterestedFields"):
+            ids = field_value.get("value", []) if isinstance(field_value, dict) else []
+            other_interested_fields = [
+                application.other_interested_fields_mapping.get(i, i) for i in ids
+            ]
+        elif field_id == field_mapping.get("Introduction"):
+            introduction = field_value
+        elif field_id == field_mapping.get("ChoiceReason"):
+            choicereason = field_value
+        elif field_id == field_mapping.get("RelatedExperience"):
+            relevant_experience = field_value
+        elif field_id == field_mapping.get("SignatureURL"):
+            signature_url = field_value
+    return (
+        name, email, phone_number, high_school_stage, city, top_interested_field,
+        other_interested_fields, introduction, choicereason, relevant_experience,
+        signature_url,
+    )
+
+
+def legacy_second_part(form_data):
+    m = application.field_mapping_two
+    nickname = official_email = school = national_id = emergency_contact_name = (
+        emergency_contact_phone
+    ) = emergency_contact_relationship = emergency_contact_name2 = (
+        emergency_contact_phone2
+    ) = emergency_contact_relationship2 = None
+    interested_fields2 = []
+    image_urls = {}
+    for answer in form_data:
+        field_id = answer.get("id")
+        field_value = answer.get("value")
+        if field_id == m.get("Nickname"):
+            nickname = field_value
+        elif field_id == m.get("OfficialEmail"):
+            official_email = field_value
+        elif field_id == m.get("SchoolName"):
+            school = field_value
+        elif field_id == m.get("NationalID"):
+            national_id = field_value
+        elif field_id == m.get("InterestedFields2"):
+            ids = field_value.get("value", []) if isinstance(field_value, dict) else []
+            interested_fields2 = [
+                application.two_interested_fields_mapping.get(i, i) for i in ids
+            ]
+        elif field_id == m.get("EmergencyContactName"):
+            emergency_contact_name = field_value
+        elif field_id == m.get("EmergencyContactPhone"):
+            emergency_contact_phone = "0" + field_value[4:]
+        elif field_id == m.get("EmergencyContactRelationship"):
+            emergency_contact_relationship = field_value
+        elif field_id == m.get("EmergencyContactName2"):
+            emergency_contact_name2 = field_value
+        elif field_id == m.get("EmergencyContactPhone2"):
+            emergency_contact_phone2 = "0" + field_value[4:]
+        elif field_id == m.get("EmergencyContactRelationship2"):
+            emergency_contact_relationship2 = field_value
+        elif field_id == m.get("StudentIDFront"):
+            image_urls["studentidfront"] = field_value.get("url")
+        elif field_id == m.get("StudentIDBack"):
+            image_urls["studentidback"] = field_value.get("url")
+        elif field_id == m.get("IDCardFront"):
+            image_urls["idcard_front"] = field_value.get("url")
+        elif field_id == m.get("IDCardBack"):
+            image_urls["idcard_back"] = field_value.get("url")
+    return (
+        nickname, official_email, school, national_id, interested_fields2,
+        emergency_contact_name, emergency_contact_phone,
+        emergency_contact_relationship, emergency_contact_name2,
+        emergency_contact_phone2, emergency_contact_relationship2, image_urls,
+    )
+
+
+def bench(label, func, answers, number):
+    seconds = min(timeit.repeat(lambda: func(answers), number=number, repeat=5))
+    per_call = seconds / number * 1e6
+    print(f"  {label:<10} {per_call:8.2f} µs/submission")
+    return per_call
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    cases = [
+        (
+            "first_part",
+            legacy_first_part,
+            application.first_part_schema,
+            first_part_answers(),
+        ),
+        (
+            "second_part",
+            legacy_second_part,
+            application.second_part_schema,
+            second_part_answers(),
+        ),
+    ]
+    for name, legacy, schema, answers in cases:
+        print(f"{name} ({len(answers)} answers)")
+        before = bench("if/elif", legacy, answers, args.number)
+        after = bench("schema", schema.parse, answers, args.number)
+        print(f"  {before / after:.1f}x faster")
@@ -0,0 +1,228 @@
+# tools/bench_interactions.py
+"""
+Benchmark: runs the review buttons (AcceptOrCancelView,
+InterviewResultView) and modals (FailureReasonModal, ChangeAssigneeModal,
+PassportCheck) against fake interactions, a stub bot and tools.stub_backend,
+and reports per interaction its wall time, how long it kept the event loop
+busy, its longest single step, and its backend and Discord API calls.
+
+    python -m tools.bench_interactions [--repeat 20] [--backend-latency 0.05]
+        [--discord-latency 0.05] [--warm] [--blocking-threshold 0.02]
+
+A step longer than --blocking-threshold means something blocked the loop,
+e.g. a requests call made from a coroutine instead of through
+get_staff_async; the run then exits with status 1. By default the staff
+cache is cleared before every interaction, --warm keeps it.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+import statistics
+
+APPLICANT = {
+    "uuid": "0b6f2a9e-1d3c-4e5f-8a7b-9c0d1e2f3a4b",
+    "real_name": "王小明",
+    "email": "applicant@loadtest.invalid",
+    "phone_number": "0912345678",
+    "interested_fields": ["企劃組"],
+    "current_group": "企劃組",
+    "permission_level": 10,
+    "team_leader": "1001",
+    "apply_message": "https://discord.com/channels/1/1/1",
+}
+LEADER = {"uuid": "leader-1", "discord_id": "1001", "permission_level": 1, "team_leader": "0"}
+OTHER_LEADER = {"uuid": "leader-2", "discord_id": "1002", "permission_level": 1, "team_leader": "0"}
+ROLES = {"DISCORD_STAFF_ROLE_ID": "5001", "PD_ROLE": "5002", "PG_ID": "5003"}
+
+
+class LoopMonitor:
+    """
+    Times every callback the event loop on `thread` runs. A coroutine step
+    is one callback, so `longest` is the longest the loop went without
+    serving anything else.
+    """
+
+    def __init__(self, thread):
+        self.thread_id = thread.ident
+        self.busy = 0.0
+        self.longest = 0.0
+        self._original = None
+
+    def __enter__(self):
+        monitor = self
+        original = self._original = asyncio.events.Handle._run
+
+        def _run(handle):
+            if threading.get_ident() != monitor.thread_id:
+                return original(handle)
+            started = time.perf_counter()
+            try:
+                return original(handle)
+            finally:
+                elapsed = time.perf_counter() - started
+                monitor.busy += elapsed
+                monitor.longest = max(monitor.longest, elapsed)
+
+        asyncio.events.Handle._run = _run
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.events.Handle._run = self._original
+
+
+def configure(workdir, backend_url, files_url):
+    """Environment for the app, set before anything from app/ is imported."""
+    os.environ.update(
+        BACKEND_ENDPOINT=backend_url,
+        SHORTEN_API_URL=files_url,
+        DOMAIN="http://bench.invalid",
+        JWT_SECRET_KEY="bench-secret-bench-secret-bench-32b",
+        APPLY_FORM_CHANNEL_ID="1",
+        APPLY_LOG_CHANNEL_ID="2",
+        OUTBOX_PATH=os.path.join(workdir, "outbox.db"),
+        OUTBOX_SOCKET="",
+        EMAIL_TEMPLATE_CACHE_DIR=os.path.join(workdir, "jinja"),
+        **ROLES,
+    )
+
+
+def stage_message(bot, stage):
+    """The embed a review button sits under, as post_initial_embed/post_stage_embed build it."""
+    import discord
+
+    from tools.stub_services import FakeMessage
+
+    embed = discord.Embed(title=stage)
+    embed.add_field(name="申請識別碼", value=APPLICANT["uuid"], inline=False)
+    embed.add_field(name="姓名", value=APPLICANT["real_name"], inline=False)
+    embed.add_field(name="申請者資料", value="http://bench.invalid/s1", inline=False)
+    return FakeMessage(bot, [embed])
+
+
+def scenarios(bot):
+    """[(name, coroutine function)], each making one interaction."""
+    from app.discord.application_process.modals import ChangeAssigneeModal, FailureReasonModal
+    from app.discord.application_process.views import REVIEW_ACTIONS, run_review
+    from app.discord.customs.modals import PassportCheck
+    from app.utils.staff import Staff
+    from tools.stub_services import FakeInteraction
+
+    # Coroutines, views and modals can only be built on a running loop
+    def click(view, action):
+        async def make():
+            interaction = FakeInteraction(bot, 1001, stage_message(bot, view))
+            await run_review(interaction, REVIEW_ACTIONS[action], APPLICANT["uuid"])
+
+        return (f"{view}.{action}", make)
+
+    def submit(name, build, values):
+        async def make():
+            interaction = FakeInteraction(
+                bot, 1001, stage_message(bot, name), role_ids=map(int, ROLES.values())
+            )
+            modal = build()
+            for item, value in zip(modal.children, values):
+                item._refresh_state(interaction, {"value": value})
+            await modal.on_submit(interaction)
+
+        return (name, make)
+
+    return [
+        click("AcceptOrCancelView", "accept"),
+        click("AcceptOrCancelView", "cancel"),
+        click("InterviewResultView", "interview_passed"),
+        click("InterviewResultView", "change_assignee"),
+        click("InterviewResultView", "interview_failed"),
+        click("InterviewResultView", "interview_cancelled"),
+        submit(
+            "FailureReasonModal",
+            lambda: FailureReasonModal(Staff(APPLICANT), action="INTERVIEW_FAILED"),
+            ["面試未出席"],
+        ),
+        submit(
+            "ChangeAssigneeModal",
+            lambda: ChangeAssigneeModal(Staff(APPLICANT)),
+            [OTHER_LEADER["discord_id"]],
+        ),
+        submit("PassportCheck", PassportCheck, [APPLICANT["real_name"], APPLICANT["uuid"]]),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--backend-latency", type=float, default=0.05)
+    parser.add_argument("--discord-latency", type=float, default=0.05)
+    parser.add_argument("--warm", action="store_true", help="Keep the staff cache between runs.")
+    parser.add_argument("--blocking-threshold", type=float, default=0.02)
+    args = parser.parse_args()
+
+    from tools import stub_backend, stub_services
+    from tools.loadtest import serve_wsgi
+
+    stub_backend.app.config["LATENCY"] = args.backend_latency
+    stub_services.files.config["LATENCY"] = args.backend_latency
+    backend_url = serve_wsgi(stub_backend.app)
+    files_url = serve_wsgi(stub_services.files)
+    configure(tempfile.mkdtemp(prefix="bench-interactions-"), backend_url, files_url)
+
+    from app.discord import bot_module
+    from app.utils.db import get_staff_cache
+    from app.utils.jobs import get_job_queue
+    from app.utils.metrics import get_registry
+
+    bot = bot_module.bot = stub_services.StubBot(args.discord_latency)
+
+    print(
+        f"{'interaction':40} {'wall ms':>8} {'loop ms':>8} {'step ms':>8}"
+        f" {'backend':>8} {'discord':>8} {'jobs':>5}"
+    )
+    blocked = []
+    for name, make in scenarios(bot):
+        walls, busy, longest, backend, discord, jobs = [], [], [], [], [], []
+        for _ in range(args.repeat):
+            stub_backend.staff.clear()
+            for record in (APPLICANT, LEADER, OTHER_LEADER):
+                stub_backend.staff[record["uuid"]] = dict(record)
+            if not args.warm:
+                get_staff_cache().clear()
+
+            before = get_registry().counts()
+            queued = sum(get_job_queue().counts().values())
+            with LoopMonitor(bot.thread) as monitor:
+                started = time.perf_counter()
+                asyncio.run_coroutine_threadsafe(make(), bot.loop).result(timeout=60)
+                walls.append(time.perf_counter() - started)
+            after = get_registry().counts()
+
+            calls = {
+                kind: sum(n - before.get((k, op), 0) for (k, op), n in after.items() if k == kind)
+                for kind in ("backend", "discord")
+            }
+            busy.append(monitor.busy)
+            longest.append(monitor.longest)
+            backend.append(calls["backend"])
+            discord.append(calls["discord"])
+            jobs.append(sum(get_job_queue().counts().values()) - queued)
+
+        step = max(longest)
+        print(
+            f"{name:40} {statistics.median(walls) * 1000:8.1f}"
+            f" {statistics.median(busy) * 1000:8.1f} {step * 1000:8.1f}"
+            f" {statistics.mean(backend):8.1f} {statistics.mean(discord):8.1f}"
+            f" {statistics.mean(jobs):5.1f}"
+        )
+        if step > args.blocking_threshold:
+            blocked.append(name)
+
+    if blocked:
+        print(f"\nBlocked the event loop for over {args.blocking_threshold * 1000:g} ms: {', '.join(blocked)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# tools/bench_metrics.py
+"""
+Benchmark: overhead of timing a call into the metrics registry, compared
+with the bare call, for a few label cardinalities and threads.
+
+    python -m tools.bench_metrics [--calls 200000] [--threads 4]
+"""
+import time
+import argparse
+import threading
+
+from app.utils.metrics import Registry, site, timed
+from app.utils import metrics
+
+
+def noop():
+    return None
+
+
+def per_call(func, calls, threads):
+    """Seconds per call with `threads` threads each making `calls` calls."""
+
+    def worker():
+        for _ in range(calls):
+            func()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return (time.perf_counter() - started) / (calls * threads)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    ops = [f"/staff/op{i}" for i in range(20)]
+    counter = iter(range(10**12))
+
+    def bare():
+        noop()
+
+    def one_series():
+        with timed("backend", "/staff/getstaff"):
+            noop()
+
+    def many_series():
+        with site("views.accept"), timed("backend", ops[next(counter) % len(ops)]):
+            noop()
+
+    for threads in (1, args.threads):
+        baseline = per_call(bare, args.calls, threads)
+        for label, func in [("timed, one series", one_series), ("site + timed, 20 series", many_series)]:
+            # Fresh registry so every run starts empty
+            metrics._registry = Registry()
+            overhead = per_call(func, args.calls, threads) - baseline
+            print(f"{threads} thread(s) {label:26} {overhead * 1e6:8.2f} µs/call overhead")
+    print(f"render, {len(metrics.get_registry()._series)} series:"
+          f" {per_call(metrics.get_registry().render, 200, 1) * 1000:.2f} ms")
@@ -0,0 +1,251 @@
+# tools/loadtest.py
+"""
+Load test: sends first and second part applications through the real
+ASGI stack at a set concurrency, against local stand-ins for the staff
+backend, shortener, SMTP server and Discord, and reports throughput,
+p50/p99 latency per route and outbound calls per submission.
+
+    python -m tools.loadtest [--applicants 200] [--concurrency 10]
+        [--backend-latency 0.05] [--shortener-latency 0.05]
+        [--smtp-latency 0.1] [--discord-latency 0.1]
+
+Everything runs in this process with databases in a temporary directory,
+nothing reaches a real service. Web and outbox settings (WEB_THREADS,
+JOB_WORKERS, MAIL_WORKERS, BACKEND_POOL_SIZE, ...) are read from the
+environment as usual, set TRACE_PATH to trace the run too.
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import tempfile
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+FIRST_PART = ["NAME", "EMAIL", "PHONE", "TOP_INTERSTED_FIELD", "INTRODUCTION"]
+SECOND_PART = [
+    "NICKNAME", "OFFICIAL_EMAIL", "SCHOOL_NAME", "NATIONAL_ID", "INTERESTED_FIELD",
+    "EMERGENCY_CONTACT_NAME", "EMERGENCY_CONTACT_PHONE",
+    "EMERGENCY_CONTACT_RELATIONSHIP", "STUDENT_ID_FRONT", "STUDENT_ID_BACK",
+    "ID_CARD_FRONT", "ID_CARD_BACK",
+]
+IMAGE_FIELDS = ["STUDENT_ID_FRONT", "STUDENT_ID_BACK", "ID_CARD_FRONT", "ID_CARD_BACK"]
+
+
+def serve_wsgi(app):
+    """Serves a Flask app on a free port from a thread, returns its base URL."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.port}"
+
+
+def serve_asgi(app):
+    """Runs uvicorn on a free port from a thread, returns its base URL."""
+    import uvicorn
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="on"))
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+def configure(args, workdir, backend_url, files_url, smtp_port):
+    """Environment for the app, set before anything from app/ is imported."""
+    for key in FIRST_PART:
+        os.environ[f"FIELD_{key}"] = f"f1_{key.lower()}"
+    for key in SECOND_PART:
+        os.environ[f"FIELD_TWO_{key}"] = f"f2_{key.lower()}"
+    os.environ["TOP_INTERESTED_FIELD_1"] = "top_1"
+    os.environ["TWO_INTERESTED_FIELD_1"] = "two_1"
+    os.environ.update(
+        ROLE="web",
+        BACKEND_ENDPOINT=backend_url,
+        SHORTEN_API_URL=files_url,
+        DOMAIN="http://loadtest.invalid",
+        JWT_SECRET_KEY="loadtest-secret-loadtest-secret-32b",
+        HIDDEN_VALUE_SECRET="f2_token",
+        APPLY_FORM_CHANNEL_ID="1",
+        APPLY_LOG_CHANNEL_ID="2",
+        MAIL_SERVER="127.0.0.1",
+        MAIL_PORT=str(smtp_port),
+        MAIL_USE_SSL="false",
+        MAIL_USE_TLS="false",
+        MAIL_USERNAME="",
+        MAIL_PASSWORD="",
+        MAIL_DEFAULT_SENDER="loadtest@hackit.tw",
+        MAIL_RATE_LIMIT=str(args.mail_rate_limit),
+        OUTBOX_PATH=os.path.join(workdir, "outbox.db"),
+        OUTBOX_POLL_INTERVAL="0.5",
+        OUTBOX_SOCKET="",
+        IDEMPOTENCY_PATH=os.path.join(workdir, "idempotency.db"),
+        IMAGE_CACHE_DIR=os.path.join(workdir, "image_cache"),
+        IMAGE_CACHE_MAX_BYTES="0",
+        EMAIL_TEMPLATE_CACHE_DIR=os.path.join(workdir, "jinja"),
+    )
+
+
+def first_part_body(i):
+    return {
+        "submissionId": f"loadtest-1-{i}",
+        "answers": [
+            {"id": "f1_name", "value": f"Applicant {i}"},
+            {"id": "f1_email", "value": f"applicant{i}@loadtest.invalid"},
+            {"id": "f1_phone", "value": "+886912345678"},
+            {"id": "f1_top_intersted_field", "value": {"value": ["top_1"]}},
+            {"id": "f1_introduction", "value": "我喜歡辦活動。" * 40},
+        ],
+    }
+
+
+def second_part_body(i, token, files_url):
+    answers = [
+        {"id": f"f2_{key.lower()}", "value": f"{key.lower()} {i}"}
+        for key in SECOND_PART
+        if key not in IMAGE_FIELDS
+    ]
+    answers += [
+        {"id": "f2_interested_field", "value": {"value": ["two_1"]}},
+        {"id": "f2_emergency_contact_phone", "value": "+886987654321"},
+    ]
+    answers += [
+        {"id": f"f2_{key.lower()}", "value": {"url": f"{files_url}/files/{i}-{key.lower()}.jpg"}}
+        for key in IMAGE_FIELDS
+    ]
+    return {
+        "submissionId": f"loadtest-2-{i}",
+        "answers": answers,
+        "hiddenFields": [{"id": "f2_token", "value": token}],
+    }
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--applicants", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--backend-latency", type=float, default=0.05)
+    parser.add_argument("--shortener-latency", type=float, default=0.05)
+    parser.add_argument("--smtp-latency", type=float, default=0.1)
+    parser.add_argument("--discord-latency", type=float, default=0.1)
+    parser.add_argument("--mail-rate-limit", type=float, default=0)
+    parser.add_argument("--drain-timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    from tools import stub_backend, stub_services
+
+    stub_backend.app.config["LATENCY"] = args.backend_latency
+    stub_services.files.config["LATENCY"] = args.shortener_latency
+    stub_services.files.config["IMAGE"] = stub_services.make_photo()
+    smtp = stub_services.SmtpSink(args.smtp_latency).start()
+    backend_url = serve_wsgi(stub_backend.app)
+    files_url = serve_wsgi(stub_services.files)
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    configure(args, workdir, backend_url, files_url, smtp.server_address[1])
+
+    import asgi
+    from app.discord import bot_module
+    from app.discord.application_process.pipeline import setup_jobs
+    from app.utils.jobs import get_job_queue
+    from app.utils.jwt import generate_form_token
+    from app.utils.metrics import get_registry
+
+    # The outbox runs here in place of bot.py, posting to the stub bot
+    bot_module.bot = stub_services.StubBot(args.discord_latency)
+    setup_jobs().start()
+    url = serve_asgi(asgi.app)
+    print(f"App on {url}, backend {backend_url}, files {files_url}, work dir {workdir}")
+
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency))
+    latencies = {"first_part": [], "second_part": []}
+    errors = []
+
+    def post(route, body):
+        started = time.perf_counter()
+        response = session.post(f"{url}/apply/{route}_application", json=body)
+        latencies[route].append(time.perf_counter() - started)
+        if response.status_code >= 300:
+            errors.append(f"{route} {response.status_code} {response.text[:100]}")
+            return False
+        return True
+
+    def applicant(i):
+        if not post("first_part", first_part_body(i)):
+            return
+        email = f"applicant{i}@loadtest.invalid"
+        uuid = next(
+            (u for u, r in list(stub_backend.staff.items()) if r.get("email") == email), None
+        )
+        if uuid is None:
+            errors.append(f"applicant {i} not in the backend")
+            return
+        post("second_part", second_part_body(i, generate_form_token(uuid), files_url))
+
+    before = get_registry().counts()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(applicant, range(args.applicants)))
+    elapsed = time.perf_counter() - started
+
+    queue = get_job_queue()
+    while True:
+        counts = queue.counts()
+        if not counts["pending"] and not counts["running"]:
+            break
+        if time.perf_counter() - started > elapsed + args.drain_timeout:
+            print(f"Outbox not drained after {args.drain_timeout:g}s: {counts}")
+            break
+        time.sleep(0.1)
+    drained = time.perf_counter() - started
+    after = get_registry().counts()
+
+    print(
+        f"\n{args.applicants} applicants, concurrency {args.concurrency}: "
+        f"{elapsed:.2f}s, {args.applicants / elapsed:.1f} applicants/s "
+        f"({len(latencies['first_part']) + len(latencies['second_part'])} requests)"
+    )
+    print(f"outbox drained after {drained:.2f}s: {queue.counts()}")
+    for route, values in latencies.items():
+        print(
+            f"{route:12} p50 {percentile(values, 0.5) * 1000:8.1f} ms"
+            f"  p99 {percentile(values, 0.99) * 1000:8.1f} ms"
+            f"  max {max(values, default=0) * 1000:8.1f} ms"
+        )
+
+    print("\noutbound calls per applicant:")
+    for (kind, op), count in sorted(after.items()):
+        calls = count - before.get((kind, op), 0)
+        if calls and kind not in ("http", "job_stage"):
+            print(f"  {kind:10} {op:45} {calls / args.applicants:6.2f}")
+    print(
+        f"  emails received {smtp.messages}, Discord messages "
+        f"{bot_module.bot.messages}, links shortened {stub_services.shortened['links']}"
+    )
+
+    if errors:
+        print(f"\n{len(errors)} error(s), first ones:")
+        for error in errors[:10]:
+            print(f"  {error}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
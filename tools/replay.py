@@ -0,0 +1,208 @@
+# tools/replay.py
+"""
+Replay: resends the requests captured with CAPTURE_PATH (see
+app/utils/capture.py) to a local instance, keeping their original
+spacing or scaled by --speed, and compares status and latency per route
+with what production saw.
+
+    python -m tools.replay capture.jsonl --url http://127.0.0.1:3000
+        [--speed 1] [--max-gap 60] [--concurrency 32] [--limit N]
+        [--backend-url http://127.0.0.1:8001] [--files-url URL] [--keep-ids]
+
+The instance needs production's FIELD_* and option ids, the corpus is
+filed under them. Its outside services should be stand-ins
+(tools.stub_backend, tools.stub_services), a replay sends real requests.
+
+--speed 2 replays twice as fast, 0 as fast as --concurrency allows.
+--max-gap shortens pauses longer than that many seconds, e.g. nights.
+Answers are masked, so each replayed request gets:
+  - fresh submission ids, so the app's idempotency doesn't take them for
+    retries (--keep-ids to leave them)
+  - ID image URLs pointing at --files-url, by default a stub image host
+    started here
+  - a second form token for a new applicant, signed with JWT_SECRET_KEY
+    (or --jwt-secret) and created in --backend-url first if given
+"""
+import os
+import sys
+import time
+import uuid
+import argparse
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from tools.loadtest import percentile
+
+# The keys app.routes.application takes the form provider's submission id from
+SUBMISSION_ID_KEYS = ("submissionId", "responseId", "id")
+
+
+def schedule(records, speed, max_gap):
+    """Seconds after the start of the replay each record is sent at."""
+    offsets = []
+    offset = 0.0
+    previous = None
+    for record in records:
+        if previous is not None and speed:
+            gap = record["time"] - previous
+            if max_gap:
+                gap = min(gap, max_gap)
+            offset += gap / speed
+        offsets.append(offset)
+        previous = record["time"]
+    return offsets
+
+
+def _point_files(value, files_url, name):
+    """File answers ({"url": ...}, or lists of them) pointed at the image host."""
+    if isinstance(value, list):
+        return [_point_files(item, files_url, f"{name}-{i}") for i, item in enumerate(value)]
+    if isinstance(value, dict) and "url" in value:
+        return {**value, "url": f"{files_url}/files/{name}.jpg"}
+    return value
+
+
+def prepare(record, n, args):
+    """The captured body made sendable again, see the module docstring."""
+    body = dict(record["body"])
+    if not args.keep_ids:
+        keys = [key for key in SUBMISSION_ID_KEYS if key in body] or ["submissionId"]
+        for key in keys:
+            body[key] = f"replay-{args.run}-{n}"
+
+    body["answers"] = [
+        {**answer, "value": _point_files(answer.get("value"), args.files_url, f"{n}-{i}")}
+        if isinstance(answer, dict)
+        else answer
+        for i, answer in enumerate(body.get("answers") or [])
+    ]
+
+    if body.get("hiddenFields"):
+        from app.utils.jwt import generate_form_token
+
+        applicant = str(uuid.uuid4())
+        if args.backend_url:
+            requests.post(
+                f"{args.backend_url}/staff/create/new",
+                json={
+                    "uuid": applicant,
+                    "real_name": "replay",
+                    "email": f"{applicant}@replay.invalid",
+                    "permission_level": 10,
+                    "team_leader": "0",
+                    "current_group": "pending",
+                },
+                timeout=10,
+            ).raise_for_status()
+        token = generate_form_token(applicant)
+        body["hiddenFields"] = [
+            {**field, "value": token} if isinstance(field, dict) else field
+            for field in body["hiddenFields"]
+        ]
+    return body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("corpus", help="CAPTURE_PATH, its rotated files are read too.")
+    parser.add_argument("--url", default="http://127.0.0.1:3000")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--max-gap", type=float, default=0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--backend-url")
+    parser.add_argument("--files-url")
+    parser.add_argument("--jwt-secret")
+    parser.add_argument("--keep-ids", action="store_true")
+    args = parser.parse_args()
+    args.run = f"{int(time.time()):x}"
+    if args.jwt_secret:
+        os.environ["JWT_SECRET_KEY"] = args.jwt_secret
+
+    from app.utils.capture import read_corpus
+
+    records = [record for record in read_corpus(args.corpus) if record.get("body") is not None]
+    if args.limit:
+        records = records[: args.limit]
+    if not records:
+        sys.exit(f"Nothing captured in {args.corpus}")
+
+    if not args.files_url:
+        from tools import stub_services
+        from tools.loadtest import serve_wsgi
+
+        stub_services.files.config["IMAGE"] = stub_services.make_photo()
+        args.files_url = serve_wsgi(stub_services.files)
+
+    offsets = schedule(records, args.speed, args.max_gap)
+    print(
+        f"Replaying {len(records)} request(s) captured over "
+        f"{records[-1]['time'] - records[0]['time']:.0f}s in {offsets[-1]:.0f}s to {args.url}"
+    )
+
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency))
+    results = {}
+    lag = [0.0]
+    lock = threading.Lock()
+
+    def send(n, record, due):
+        lateness = time.perf_counter() - due
+        started = time.perf_counter()
+        try:
+            body = prepare(record, n, args)
+            started = time.perf_counter()
+            response = session.request(record["method"], f"{args.url}{record['path']}", json=body)
+            status = response.status_code
+        except requests.RequestException as e:
+            print(f"{record['path']}: {e}")
+            status = None
+        elapsed = time.perf_counter() - started
+        with lock:
+            lag[0] = max(lag[0], lateness)
+            results.setdefault(record["path"], []).append((record, status, elapsed))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for n, (record, offset) in enumerate(zip(records, offsets)):
+            due = started + offset
+            pause = due - time.perf_counter()
+            if pause > 0:
+                time.sleep(pause)
+            pool.submit(send, n, record, due)
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"Done in {elapsed:.1f}s, {len(records) / elapsed:.1f} requests/s, "
+        f"sent up to {lag[0] * 1000:.0f} ms late"
+    )
+    mismatched = 0
+    for path, sent in sorted(results.items()):
+        recorded = [record["duration"] for record, _, _ in sent]
+        replayed = [elapsed for _, _, elapsed in sent]
+        print(
+            f"\n{path}  {len(sent)} request(s)\n"
+            f"  recorded  p50 {percentile(recorded, 0.5) * 1000:8.1f} ms"
+            f"  p99 {percentile(recorded, 0.99) * 1000:8.1f} ms\n"
+            f"  replayed  p50 {percentile(replayed, 0.5) * 1000:8.1f} ms"
+            f"  p99 {percentile(replayed, 0.99) * 1000:8.1f} ms"
+        )
+        statuses = {}
+        for record, status, _ in sent:
+            key = (record["status"], status)
+            statuses[key] = statuses.get(key, 0) + 1
+        for (was, now), count in sorted(statuses.items(), key=str):
+            print(f"  status {was} -> {now}: {count}")
+            if was != now:
+                mismatched += count
+
+    if mismatched:
+        print(f"\n{mismatched} request(s) answered differently than in production")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# tools/stub_backend.py
+"""
+Local stand-in for the staff backend, for trying the app without the real
+one. Keeps staff in memory and speaks the same endpoints app.utils.db uses,
+including multipart image uploads.
+
+    python -m tools.stub_backend --port 8001
+    BACKEND_ENDPOINT=http://127.0.0.1:8001 BACKEND_IMAGE_UPLOAD=multipart ...
+
+--no-multipart answers 415 to multipart uploads, to exercise the JSON fallback.
+--latency adds that many seconds to every response, like a remote backend.
+"""
+import json
+import time
+import base64
+import argparse
+import threading
+
+from flask import Flask, jsonify, request
+
+app = Flask(__name__)
+app.config["MULTIPART"] = True
+app.config["LATENCY"] = 0.0
+
+staff = {}
+uploads = {"json": 0, "multipart": 0, "image_bytes": 0}
+_lock = threading.Lock()
+
+
+@app.before_request
+def delay():
+    if app.config["LATENCY"] and request.endpoint != "stats":
+        time.sleep(app.config["LATENCY"])
+
+
+def _matches(record, query):
+    return all(str(record.get(key)) == str(value) for key, value in query.items())
+
+
+@app.route("/staff/getstaffs", methods=["POST"])
+def get_staffs():
+    query = request.get_json(silent=True) or {}
+    with _lock:
+        data = [record for record in staff.values() if _matches(record, query)]
+
+    if "page" in request.args:
+        page_size = int(request.args.get("page_size", 50))
+        page = int(request.args["page"])
+        data = data[(page - 1) * page_size : page * page_size]
+    if "fields" in request.args:
+        fields = request.args["fields"].split(",")
+        data = [{k: v for k, v in record.items() if k in fields} for record in data]
+
+    if not data:
+        return jsonify({"data": None}), 404
+    return jsonify({"data": data})
+
+
+@app.route("/staff/create/new", methods=["POST"])
+def create():
+    record = request.get_json()
+    with _lock:
+        staff[record["uuid"]] = record
+    return jsonify({"status": "ok"}), 201
+
+
+def _resolve_images(record, files):
+    """Replaces "cid:<part>" references with the uploaded bytes, as base64."""
+    for field in ("student_card", "id_card"):
+        sides = record.get(field)
+        if not isinstance(sides, dict):
+            continue
+        for side, value in sides.items():
+            if isinstance(value, str) and value.startswith("cid:"):
+                part = files.get(value[4:])
+                if part is None:
+                    raise KeyError(value)
+                data = part.read()
+                uploads["image_bytes"] += len(data)
+                sides[side] = base64.b64encode(data).decode("ascii")
+    return record
+
+
+@app.route("/staff/update/<uuid>", methods=["POST"])
+def update(uuid):
+    if request.mimetype == "multipart/form-data":
+        if not app.config["MULTIPART"]:
+            return jsonify({"status": "error", "message": "JSON only"}), 415
+        try:
+            record = _resolve_images(json.loads(request.form["data"]), request.files)
+        except (KeyError, ValueError) as e:
+            return jsonify({"status": "error", "message": f"Bad upload: {e}"}), 400
+        uploads["multipart"] += 1
+    else:
+        record = request.get_json()
+        uploads["json"] += 1
+
+    with _lock:
+        if uuid not in staff:
+            return jsonify({"status": "error", "message": "Not found"}), 404
+        staff[uuid].update(record)
+    return jsonify({"status": "ok"})
+
+
+@app.route("/staff/send/verify/<uuid>", methods=["POST"])
+def send_verify(uuid):
+    return jsonify({"status": "ok"})
+
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify({"staff": len(staff), **uploads})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--no-multipart", action="store_true")
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    app.config["MULTIPART"] = not args.no_multipart
+    app.config["LATENCY"] = args.latency
+    app.run(host=args.host, port=args.port, threaded=True)
@@ -0,0 +1,225 @@
+# tools/stub_services.py
+"""
+Local stand-ins for the services the app talks to besides the staff
+backend (tools.stub_backend): the link shortener, a host for the ID card
+images the second form links to, an SMTP server that accepts and drops
+every message, and a Discord bot whose channels take messages without a
+connection, with the interactions, messages and members its handlers
+get. Each waits `latency` seconds per call, like the real thing.
+"""
+import io
+import time
+import itertools
+import asyncio
+import threading
+import socketserver
+
+from types import SimpleNamespace
+
+from flask import Flask, Response, jsonify
+
+from app.utils.metrics import timed
+
+# -- shortener and image host --
+
+files = Flask(__name__)
+files.config["LATENCY"] = 0.0
+files.config["IMAGE"] = None
+shortened = {"links": 0}
+_lock = threading.Lock()
+_message_ids = itertools.count(1000)
+
+
+@files.before_request
+def delay():
+    if files.config["LATENCY"]:
+        time.sleep(files.config["LATENCY"])
+
+
+@files.route("/shorten", methods=["POST"])
+def shorten():
+    with _lock:
+        shortened["links"] += 1
+        number = shortened["links"]
+    return jsonify({"short_url": f"s{number}"})
+
+
+@files.route("/files/<name>")
+def image(name):
+    return Response(files.config["IMAGE"], mimetype="image/jpeg")
+
+
+def make_photo(width=1600, height=1200):
+    """A JPEG about the size of a phone photo, noise so it doesn't compress away."""
+    from PIL import Image
+
+    size = (width // 4, height // 4)
+    pixels = bytes((i * 7919) % 251 for i in range(size[0] * size[1] * 3))
+    photo = Image.frombytes("RGB", size, pixels).resize((width, height))
+    buffer = io.BytesIO()
+    photo.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+# -- SMTP --
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        reply = lambda line: self.wfile.write(f"{line}\r\n".encode("ascii"))
+        reply("220 stub ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("ascii", "replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                reply("250 stub")
+            elif command == "DATA":
+                reply("354 end with .")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                time.sleep(server.latency)
+                with server.lock:
+                    server.messages += 1
+                reply("250 queued")
+            elif command == "QUIT":
+                reply("221 bye")
+                return
+            else:
+                reply("250 ok")
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    """Plain SMTP (no TLS, no auth) on 127.0.0.1, counting messages."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency=0.0, port=0):
+        super().__init__(("127.0.0.1", port), _SmtpHandler)
+        self.latency = latency
+        self.messages = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="smtp-sink", daemon=True).start()
+        return self
+
+
+# -- Discord --
+
+
+class StubChannel:
+    def __init__(self, bot, channel_id):
+        self.bot = bot
+        self.id = channel_id
+
+    async def send(self, content=None, embed=None, view=None):
+        await self.bot.call("POST /channels/{channel_id}/messages")
+        self.bot.messages += 1
+        return FakeMessage(self.bot, [embed] if embed else [], channel=self)
+
+    def get_partial_message(self, message_id):
+        return FakeMessage(self.bot, channel=self, message_id=message_id)
+
+
+class StubBot:
+    """
+    Just enough of commands.Bot for the outbox stages and interaction
+    handlers: its own loop on a thread (run_on_bot schedules onto
+    bot.loop), channels and users.
+    """
+
+    def __init__(self, latency=0.0):
+        self.delay = latency
+        self.messages = 0
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="stub-bot", daemon=True
+        )
+        self.thread.start()
+
+    async def call(self, route):
+        """A Discord REST call, counted like instrument_discord counts the real ones."""
+        with timed("discord", route):
+            await asyncio.sleep(self.delay)
+
+    async def wait_until_ready(self):
+        pass
+
+    def get_channel(self, channel_id):
+        return StubChannel(self, channel_id)
+
+    async def fetch_user(self, user_id):
+        await self.call("GET /users/{user_id}")
+        return FakeMember(self, int(user_id))
+
+
+class FakeMessage:
+    def __init__(self, bot, embeds=(), channel=None, message_id=None):
+        self.bot = bot
+        self.id = message_id or next(_message_ids)
+        self.embeds = list(embeds)
+        self.channel = channel or SimpleNamespace(id=1)
+        self.guild = SimpleNamespace(id=1)
+
+    async def delete(self):
+        await self.bot.call("DELETE /channels/{channel_id}/messages/{message_id}")
+
+
+class FakeMember:
+    def __init__(self, bot, user_id):
+        self.bot = bot
+        self.id = user_id
+        self.mention = f"<@{user_id}>"
+        self.roles = []
+
+    async def add_roles(self, *roles):
+        for role in roles:
+            await self.bot.call("PUT /guilds/{guild_id}/members/{user_id}/roles/{role_id}")
+            self.roles.append(role)
+
+
+class FakeResponse:
+    def __init__(self, bot):
+        self.bot = bot
+        self.modal = None
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def _respond(self):
+        await self.bot.call("POST /interactions/{interaction_id}/{interaction_token}/callback")
+        self._done = True
+
+    async def defer(self, **kwargs):
+        await self._respond()
+
+    async def send_message(self, content=None, **kwargs):
+        await self._respond()
+
+    async def send_modal(self, modal):
+        await self._respond()
+        self.modal = modal
+
+
+class FakeFollowup:
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def send(self, content=None, **kwargs):
+        await self.bot.call("POST /webhooks/{application_id}/{interaction_token}")
+
+
+class FakeInteraction:
+    """A button click or modal submit by `user_id`, on `message` if given."""
+
+    def __init__(self, bot, user_id, message=None, role_ids=()):
+        self.user = FakeMember(bot, user_id)
+        self.message = message
+        self.guild = SimpleNamespace(id=1, roles=[SimpleNamespace(id=i) for i in role_ids])
+        self.response = FakeResponse(bot)
+        self.followup = FakeFollowup(bot)